@@ -10,7 +10,13 @@ from aiogram.types import BotCommand
 from loader import create_bot, dp, crypto_pay
 from handlers import register_handlers
 from handlers.user import crypto_payments
+from services.fastsaver import fastsaver_client
+from services.ytdlp_pool import ytdlp_pool
+from utils.bot_profile import get_bot_profile
+from utils.download_files.clean_url import short_link_resolver
+from utils.executors import shutdown_executors
 from utils.logger import setup_logger
+from utils.stats_writer import download_stats_writer
 
 logger = logging.getLogger(__name__)
 bot = create_bot()
@@ -32,7 +38,9 @@ async def main() -> None:
     setup_logger(bot)
     logger.info("Регистрация обработчиков...")
     register_handlers(dp)
-    
+    download_stats_writer.start()
+
+    await get_bot_profile(bot, refresh=True)
 
     logger.info("Установка команд бота...")
     await set_bot_commands(bot)
@@ -50,6 +58,11 @@ async def main() -> None:
         logger.info("Polling cancelled.")
         raise
     finally:
+        await download_stats_writer.stop()
+        await short_link_resolver.close()
+        await fastsaver_client.close()
+        shutdown_executors()
+        ytdlp_pool.close_all()
         await bot.session.close()
         logger.info("Bot session closed.")
 
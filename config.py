@@ -50,8 +50,71 @@ YOUTUBE_PRICING = {
 
 DOWNLOAD_FILE_LIMIT = 100
 
+# In-memory tier in front of media_cache (file_id by url/media_type/quality)
+MEDIA_CACHE_MEMORY_SIZE = int(os.getenv("MEDIA_CACHE_MEMORY_SIZE", "5000"))
+MEDIA_CACHE_MEMORY_TTL_SECONDS = int(os.getenv("MEDIA_CACHE_MEMORY_TTL_SECONDS", "3600"))
+
+# Write-behind статистики скачиваний: окно агрегации и максимум ключей в пачке
+STATS_FLUSH_INTERVAL_SECONDS = float(os.getenv("STATS_FLUSH_INTERVAL_SECONDS", "2"))
+STATS_FLUSH_MAX_BATCH = int(os.getenv("STATS_FLUSH_MAX_BATCH", "500"))
+
+# Раскрытые короткие ссылки TikTok (vt./vm.tiktok.com -> /@/video/ID)
+SHORT_LINK_CACHE_SIZE = int(os.getenv("SHORT_LINK_CACHE_SIZE", "10000"))
+SHORT_LINK_CACHE_TTL_SECONDS = int(os.getenv("SHORT_LINK_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+
+# YouTube: кэш разобранных pytubefix.YouTube между меню качества и скачиванием
+YOUTUBE_OBJECT_CACHE_SIZE = int(os.getenv("YOUTUBE_OBJECT_CACHE_SIZE", "256"))
+YOUTUBE_OBJECT_CACHE_TTL_SECONDS = int(os.getenv("YOUTUBE_OBJECT_CACHE_TTL_SECONDS", "900"))
+
+# YouTube: кэш метаданных и списка форматов (Postgres + память), stale-while-revalidate
+YOUTUBE_METADATA_TTL_SECONDS = int(os.getenv("YOUTUBE_METADATA_TTL_SECONDS", str(6 * 60 * 60)))
+YOUTUBE_METADATA_STALE_TTL_SECONDS = int(os.getenv("YOUTUBE_METADATA_STALE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+YOUTUBE_METADATA_MEMORY_SIZE = int(os.getenv("YOUTUBE_METADATA_MEMORY_SIZE", "2000"))
+
+# YouTube: параллельная загрузка потоков диапазонами (&range=start-end)
+YOUTUBE_RANGE_CHUNK_BYTES = int(os.getenv("YOUTUBE_RANGE_CHUNK_BYTES", str(9 * 1024 * 1024)))
+YOUTUBE_RANGE_WORKERS = int(os.getenv("YOUTUBE_RANGE_WORKERS", "4"))
+YOUTUBE_RANGE_SPLIT_MIN_BYTES = int(os.getenv("YOUTUBE_RANGE_SPLIT_MIN_BYTES", str(20 * 1024 * 1024)))
+# Mux на лету через FIFO в ffmpeg (без промежуточных _video/_audio файлов)
+YOUTUBE_STREAM_MUX = os.getenv("YOUTUBE_STREAM_MUX", "0").strip().lower() in {"1", "true", "yes", "on"}
+
+# Повторы yt-dlp (TikTok/Instagram): число попыток и экспоненциальная пауза с джиттером
+DOWNLOAD_RETRY_ATTEMPTS = int(os.getenv("DOWNLOAD_RETRY_ATTEMPTS", "3"))
+DOWNLOAD_RETRY_BASE_DELAY = float(os.getenv("DOWNLOAD_RETRY_BASE_DELAY", "1"))
+DOWNLOAD_RETRY_MAX_DELAY = float(os.getenv("DOWNLOAD_RETRY_MAX_DELAY", "8"))
+
+# Пул прогретых yt_dlp.YoutubeDL: сколько держать на профиль и после скольких загрузок пересоздавать
+YTDLP_POOL_MAX_IDLE = int(os.getenv("YTDLP_POOL_MAX_IDLE", "4"))
+YTDLP_POOL_MAX_USES = int(os.getenv("YTDLP_POOL_MAX_USES", "50"))
+
+# Пулы потоков для блокирующей работы загрузчиков (utils/executors.py)
+EXECUTOR_METADATA_WORKERS = int(os.getenv("EXECUTOR_METADATA_WORKERS", "8"))
+EXECUTOR_TRANSFER_WORKERS = int(os.getenv("EXECUTOR_TRANSFER_WORKERS", "8"))
+EXECUTOR_PROCESSING_WORKERS = int(os.getenv("EXECUTOR_PROCESSING_WORKERS", "4"))
+EXECUTOR_DISK_IO_WORKERS = int(os.getenv("EXECUTOR_DISK_IO_WORKERS", "4"))
+
+# Допуск загрузок: общий лимит одновременных загрузок и лимиты по платформам
+DOWNLOAD_MAX_CONCURRENT = int(os.getenv("DOWNLOAD_MAX_CONCURRENT", "8"))
+DOWNLOAD_PLATFORM_LIMITS = {
+    "youtube": int(os.getenv("DOWNLOAD_MAX_CONCURRENT_YOUTUBE", "4")),
+    "tiktok": int(os.getenv("DOWNLOAD_MAX_CONCURRENT_TIKTOK", "4")),
+    "instagram": int(os.getenv("DOWNLOAD_MAX_CONCURRENT_INSTAGRAM", "4")),
+}
+# Приоритеты очереди загрузок: доля слотов по классам и штраф за длительность видео
+DOWNLOAD_PRIORITY_WEIGHTS = {
+    "token_x": int(os.getenv("DOWNLOAD_PRIORITY_WEIGHT_TOKEN_X", "6")),
+    "token": int(os.getenv("DOWNLOAD_PRIORITY_WEIGHT_TOKEN", "3")),
+    "free": int(os.getenv("DOWNLOAD_PRIORITY_WEIGHT_FREE", "1")),
+}
+DOWNLOAD_DURATION_PENALTY_RATIO = float(os.getenv("DOWNLOAD_DURATION_PENALTY_RATIO", "0.05"))
+DOWNLOAD_DURATION_PENALTY_MAX_SECONDS = float(os.getenv("DOWNLOAD_DURATION_PENALTY_MAX_SECONDS", "60"))
+
 BROADCAST_PROGRESS_UPDATE_INTERVAL = 7
-BROADCAST_PER_MESSAGE_DELAY = 0.2
+# Рассылка: общий лимит Bot API ~30 msg/s, держим запас; воркеры ждут ответы параллельно
+BROADCAST_RATE_PER_SECOND = float(os.getenv("BROADCAST_RATE_PER_SECOND", "25"))
+BROADCAST_BURST = float(os.getenv("BROADCAST_BURST", "25"))
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "16"))
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
 
 
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
@@ -7,3 +7,4 @@ from .downloads import DailyDownload, TotalDownload, DownloadLink
 from .platforms import PlatformDownload
 from .tokens import UserTokenWallet, DailySocialUsage
 from .media_cache import MediaCache
+from .youtube_metadata import YouTubeMetadata
@@ -9,12 +9,16 @@ from sqlalchemy import (
     PrimaryKeyConstraint, 
     select, 
     String, 
-    DateTime
+    DateTime,
+    delete,
 )
 import datetime as dt
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.base import Base
+from db.tokens import DailySocialUsage, today_utc
+from db.users import User, UserActivity
 
 
 class DailyDownload(Base):
@@ -54,7 +58,7 @@ class DownloadLink(Base):
 
 async def get_daily_downloads(session: AsyncSession, user_id: int) -> int:
     """Возвращает количество загрузок пользователя за сегодня."""
-    today = datetime.date.today()
+    today = today_utc()
     row = await session.get(DailyDownload, {"user_id": user_id, "date": today})
     return row.count if row else 0
 
@@ -71,7 +75,7 @@ async def get_or_create_daily_download(session: AsyncSession, user_id: int, date
 
 async def increment_daily_download(session: AsyncSession, user_id: int) -> None:
     """Увеличивает дневной счётчик загрузок пользователя."""
-    today = datetime.date.today()
+    today = today_utc()
     row = await get_or_create_daily_download(session, user_id, today)
     row.count += 1
     await session.commit()
@@ -127,7 +131,6 @@ async def add_download_link(session: AsyncSession, user_id: int, url: str) -> No
     to_delete = await session.execute(subq)
     ids = [r[0] for r in to_delete.all()]
     if ids:
-        from sqlalchemy import delete
         await session.execute(delete(DownloadLink).where(DownloadLink.id.in_(ids)))
     await session.commit()
 
@@ -159,3 +162,124 @@ async def get_last_links(
     )
     rows = await session.execute(q)
     return [r[0] for r in rows.all()]
+
+
+
+SOCIAL_PLATFORMS = {"tiktok", "instagram"}
+
+
+async def record_download(
+    session: AsyncSession,
+    user_id: int,
+    platform: str,
+    url: str,
+    first_name: str | None = None,
+    username: str | None = None,
+    counters: bool = True,
+) -> None:
+    """
+    Записывает всю статистику успешного скачивания одной транзакцией:
+    пользователь, активность, дневной/общий/платформенный счётчики, ссылка в истории
+    и дневной лимит Tiktok/Insta. Счётчики — атомарные INSERT ... ON CONFLICT DO UPDATE,
+    без предварительного SELECT. Коммит остаётся за вызывающим.
+
+    counters=False пропускает активность и счётчики скачиваний — их пишет
+    фоновый DownloadStatsWriter пачками (см. flush_download_counters).
+    """
+    user_stmt = pg_insert(User).values(id=user_id, first_name=first_name, username=username)
+    await session.execute(
+        user_stmt.on_conflict_do_update(
+            index_elements=[User.id],
+            set_={
+                "first_name": user_stmt.excluded.first_name,
+                "username": user_stmt.excluded.username,
+                "bot_blocked_at": None,
+            },
+        )
+    )
+    if counters:
+        await flush_download_counters(session, {(user_id, today_utc(), platform): 1})
+
+    if platform in SOCIAL_PLATFORMS:
+        social_stmt = pg_insert(DailySocialUsage).values(user_id=user_id, date=today_utc(), used_count=1)
+        await session.execute(
+            social_stmt.on_conflict_do_update(
+                index_elements=[DailySocialUsage.user_id, DailySocialUsage.date],
+                set_={"used_count": DailySocialUsage.used_count + 1},
+            )
+        )
+
+    await session.execute(
+        pg_insert(DownloadLink).values(user_id=user_id, url=url[:1024], created_at=dt.datetime.utcnow())
+    )
+    # Оставляем только последние MAX_STORED_LINKS одним DELETE
+    stale_ids = (
+        select(DownloadLink.id)
+        .where(DownloadLink.user_id == user_id)
+        .order_by(DownloadLink.created_at.desc())
+        .offset(MAX_STORED_LINKS)
+    )
+    await session.execute(
+        delete(DownloadLink)
+        .where(DownloadLink.user_id == user_id, DownloadLink.id.in_(stale_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def flush_download_counters(
+    session: AsyncSession,
+    increments: dict[tuple[int, datetime.date, str], int],
+) -> None:
+    """
+    Применяет накопленные инкременты {(user_id, date, platform): count} пачкой:
+    по одному многострочному upsert на daily_downloads, total_downloads и
+    platform_downloads плюс одна запись user_activity на пользователя.
+    Коммит остаётся за вызывающим.
+    """
+    from db.platforms import PlatformDownload
+
+    if not increments:
+        return
+
+    daily: dict[tuple[int, datetime.date], int] = {}
+    total: dict[int, int] = {}
+    per_platform: dict[tuple[int, str], int] = {}
+    for (user_id, day, platform), count in increments.items():
+        daily[(user_id, day)] = daily.get((user_id, day), 0) + count
+        total[user_id] = total.get(user_id, 0) + count
+        per_platform[(user_id, platform)] = per_platform.get((user_id, platform), 0) + count
+
+    await session.execute(
+        pg_insert(UserActivity).values([{"user_id": user_id} for user_id in sorted(total)])
+    )
+
+    # Сортировка строк даёт одинаковый порядок блокировок у параллельных flush'ей
+    daily_stmt = pg_insert(DailyDownload).values(
+        [{"user_id": u, "date": d, "count": c} for (u, d), c in sorted(daily.items())]
+    )
+    await session.execute(
+        daily_stmt.on_conflict_do_update(
+            index_elements=[DailyDownload.user_id, DailyDownload.date],
+            set_={"count": DailyDownload.count + daily_stmt.excluded.count},
+        )
+    )
+
+    total_stmt = pg_insert(TotalDownload).values(
+        [{"user_id": u, "total": c} for u, c in sorted(total.items())]
+    )
+    await session.execute(
+        total_stmt.on_conflict_do_update(
+            index_elements=[TotalDownload.user_id],
+            set_={"total": TotalDownload.total + total_stmt.excluded.total},
+        )
+    )
+
+    platform_stmt = pg_insert(PlatformDownload).values(
+        [{"user_id": u, "platform": p, "count": c} for (u, p), c in sorted(per_platform.items())]
+    )
+    await session.execute(
+        platform_stmt.on_conflict_do_update(
+            index_elements=[PlatformDownload.user_id, PlatformDownload.platform],
+            set_={"count": PlatformDownload.count + platform_stmt.excluded.count},
+        )
+    )
@@ -2,15 +2,24 @@ from __future__ import annotations
 
 import logging
 
-from sqlalchemy import BigInteger, Column, DateTime, Integer, String, UniqueConstraint, func, select, delete
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, UniqueConstraint, event, func, select, delete
 from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
+from config import MEDIA_CACHE_MEMORY_SIZE, MEDIA_CACHE_MEMORY_TTL_SECONDS
 from db.base import Base
+from utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 _missing_table_warned = False
 
+# Горячие ссылки отдаются из памяти без похода в Postgres
+_memory_cache = TTLCache(MEDIA_CACHE_MEMORY_SIZE, MEDIA_CACHE_MEMORY_TTL_SECONDS)
+
+# Изменения памяти, ждущие коммита сессии: (key, file_id | None)
+_PENDING_KEY = "media_cache_pending"
+
 
 class MediaCache(Base):
     __tablename__ = "media_cache"
@@ -39,6 +48,34 @@ def _norm_quality(quality: str | None) -> str:
     return value or "default"
 
 
+def _cache_key(url: str, media_type: str, quality: str | None) -> tuple[str, str, str]:
+    return (url or "")[:1024], _norm_media_type(media_type), _norm_quality(quality)
+
+
+def _defer_memory_update(session: AsyncSession, key: tuple[str, str, str], file_id: str | None) -> None:
+    """Память обновляется только после коммита: откаченная запись не должна попасть в кэш."""
+    session.info.setdefault(_PENDING_KEY, []).append((key, file_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_memory_updates(session: Session) -> None:
+    for key, file_id in session.info.pop(_PENDING_KEY, ()):
+        if file_id is None:
+            _memory_cache.pop(key)
+        else:
+            _memory_cache.set(key, file_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending_memory_updates(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def get_media_cache_stats() -> dict[str, int]:
+    """Счётчики in-memory кэша file_id: size, hits, misses."""
+    return _memory_cache.stats()
+
+
 def _is_media_cache_missing(exc: ProgrammingError) -> bool:
     sqlstate = getattr(getattr(exc, "orig", None), "sqlstate", None)
     if sqlstate == "42P01":
@@ -61,18 +98,27 @@ async def get_cached_file_id(
     media_type: str,
     quality: str | None,
 ) -> str | None:
+    key = _cache_key(url, media_type, quality)
+    file_id = _memory_cache.get(key)
+    if file_id:
+        return file_id
+
+    normalized_url, normalized_media_type, normalized_quality = key
     query = (
         select(MediaCache.file_id)
         .where(
-            MediaCache.url == (url or "")[:1024],
-            MediaCache.media_type == _norm_media_type(media_type),
-            MediaCache.quality == _norm_quality(quality),
+            MediaCache.url == normalized_url,
+            MediaCache.media_type == normalized_media_type,
+            MediaCache.quality == normalized_quality,
         )
         .limit(1)
     )
     try:
         result = await session.execute(query)
-        return result.scalar_one_or_none()
+        file_id = result.scalar_one_or_none()
+        if file_id:
+            _memory_cache.set(key, file_id)
+        return file_id
     except ProgrammingError as exc:
         if _is_media_cache_missing(exc):
             await session.rollback()
@@ -94,10 +140,9 @@ async def upsert_cached_media(
     if not file_id:
         return None
 
+    key = _cache_key(url, media_type, quality)
     try:
-        normalized_url = (url or "")[:1024]
-        normalized_media_type = _norm_media_type(media_type)
-        normalized_quality = _norm_quality(quality)
+        normalized_url, normalized_media_type, normalized_quality = key
 
         row = (
             await session.execute(
@@ -114,6 +159,7 @@ async def upsert_cached_media(
             if created_by_user_id is not None:
                 row.created_by_user_id = created_by_user_id
             await session.flush()
+            _defer_memory_update(session, key, file_id)
             return row
 
         row = MediaCache(
@@ -125,6 +171,7 @@ async def upsert_cached_media(
         )
         session.add(row)
         await session.flush()
+        _defer_memory_update(session, key, file_id)
         return row
     except ProgrammingError as exc:
         if _is_media_cache_missing(exc):
@@ -141,15 +188,20 @@ async def delete_cached_media(
     media_type: str,
     quality: str | None,
 ) -> None:
+    key = _cache_key(url, media_type, quality)
+    _memory_cache.pop(key)
+    normalized_url, normalized_media_type, normalized_quality = key
     try:
         await session.execute(
             delete(MediaCache).where(
-                MediaCache.url == (url or "")[:1024],
-                MediaCache.media_type == _norm_media_type(media_type),
-                MediaCache.quality == _norm_quality(quality),
+                MediaCache.url == normalized_url,
+                MediaCache.media_type == normalized_media_type,
+                MediaCache.quality == normalized_quality,
             )
         )
         await session.flush()
+        # Повторно после коммита: читатель мог вернуть ссылку в память из ещё не удалённой строки
+        _defer_memory_update(session, key, None)
     except ProgrammingError as exc:
         if _is_media_cache_missing(exc):
             await session.rollback()
@@ -3,14 +3,17 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import date, datetime, timezone
 
-from sqlalchemy import Column, Date, DateTime, ForeignKey, Integer, BigInteger, func, select
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Integer, BigInteger, case, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import DAILY_FREE_TOKENS
 from db.base import Base
+from db.users import User
 
 
-def _today_utc() -> date:
+def today_utc() -> date:
+    """Сегодняшняя дата по UTC — общий ключ дня для токенов, лимитов и статистики скачиваний."""
     return datetime.now(timezone.utc).date()
 
 
@@ -21,7 +24,7 @@ class UserTokenWallet(Base):
     daily_tokens = Column(Integer, nullable=False, default=DAILY_FREE_TOKENS)
     bonus_tokens = Column(Integer, nullable=False, default=0)
     token_x = Column(Integer, nullable=False, default=0)
-    daily_refill_date = Column(Date, nullable=False, default=_today_utc)
+    daily_refill_date = Column(Date, nullable=False, default=today_utc)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
@@ -45,98 +48,222 @@ class TokenSnapshot:
         return self.daily_tokens + self.bonus_tokens
 
 
-def _to_snapshot(wallet: UserTokenWallet) -> TokenSnapshot:
+_WALLET_COLUMNS = (
+    UserTokenWallet.daily_tokens,
+    UserTokenWallet.bonus_tokens,
+    UserTokenWallet.token_x,
+    UserTokenWallet.daily_refill_date,
+)
+
+
+def _to_snapshot(row, *, effective: bool = True) -> TokenSnapshot:
+    """
+    Снимок кошелька. Суточное пополнение хранится лениво: если daily_refill_date
+    не сегодня, эффективный daily_tokens — DAILY_FREE_TOKENS, а в строку он
+    записывается только при списании.
+    """
+    today = today_utc()
+    if effective and row.daily_refill_date != today:
+        daily_tokens, refill_date = DAILY_FREE_TOKENS, today
+    else:
+        daily_tokens, refill_date = int(row.daily_tokens or 0), row.daily_refill_date
     return TokenSnapshot(
-        daily_tokens=int(wallet.daily_tokens or 0),
-        bonus_tokens=int(wallet.bonus_tokens or 0),
-        token_x=int(wallet.token_x or 0),
-        daily_refill_date=wallet.daily_refill_date,
+        daily_tokens=daily_tokens,
+        bonus_tokens=int(row.bonus_tokens or 0),
+        token_x=int(row.token_x or 0),
+        daily_refill_date=refill_date,
     )
 
 
-async def _get_or_create_wallet(session: AsyncSession, user_id: int) -> UserTokenWallet:
-    wallet = await session.get(UserTokenWallet, user_id)
-    if wallet:
-        return wallet
-
-    wallet = UserTokenWallet(
-        user_id=user_id,
+def _default_snapshot() -> TokenSnapshot:
+    """Кошелёк пользователя, у которого строки ещё нет."""
+    return TokenSnapshot(
         daily_tokens=DAILY_FREE_TOKENS,
         bonus_tokens=0,
         token_x=0,
-        daily_refill_date=_today_utc(),
+        daily_refill_date=today_utc(),
     )
-    session.add(wallet)
-    await session.flush()
-    return wallet
 
 
-def _apply_daily_refill(wallet: UserTokenWallet) -> bool:
-    today = _today_utc()
-    if wallet.daily_refill_date == today:
-        return False
+def _refilled_daily_tokens(today: date):
+    """daily_tokens с учётом суточного пополнения — SQL-выражение для списаний."""
+    return case(
+        (UserTokenWallet.daily_refill_date != today, DAILY_FREE_TOKENS),
+        else_=UserTokenWallet.daily_tokens,
+    )
+
+
+async def _add_to_wallet(
+    session: AsyncSession,
+    user_id: int,
+    *,
+    bonus_tokens: int = 0,
+    token_x: int = 0,
+) -> TokenSnapshot:
+    """
+    Начисление одним INSERT ... ON CONFLICT DO UPDATE ... RETURNING: создаёт
+    кошелёк или прибавляет к балансу. Суточные токены не трогает.
+    """
+    stmt = pg_insert(UserTokenWallet).values(
+        user_id=user_id,
+        daily_tokens=DAILY_FREE_TOKENS,
+        bonus_tokens=bonus_tokens,
+        token_x=token_x,
+        daily_refill_date=today_utc(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserTokenWallet.user_id],
+        set_={
+            "bonus_tokens": UserTokenWallet.bonus_tokens + bonus_tokens,
+            "token_x": UserTokenWallet.token_x + token_x,
+            "updated_at": func.now(),
+        },
+    ).returning(*_WALLET_COLUMNS)
+    return _to_snapshot((await session.execute(stmt)).one())
+
+
+async def _create_wallet(session: AsyncSession, user_id: int) -> None:
+    await session.execute(
+        pg_insert(UserTokenWallet)
+        .values(
+            user_id=user_id,
+            daily_tokens=DAILY_FREE_TOKENS,
+            bonus_tokens=0,
+            token_x=0,
+            daily_refill_date=today_utc(),
+        )
+        .on_conflict_do_nothing(index_elements=[UserTokenWallet.user_id])
+    )
+
 
-    wallet.daily_tokens = DAILY_FREE_TOKENS
-    wallet.daily_refill_date = today
-    return True
+async def _read_wallet(session: AsyncSession, user_id: int, *, effective: bool = True) -> TokenSnapshot | None:
+    row = (
+        await session.execute(select(*_WALLET_COLUMNS).where(UserTokenWallet.user_id == user_id))
+    ).one_or_none()
+    return _to_snapshot(row, effective=effective) if row is not None else None
 
 
 async def get_token_snapshot(session: AsyncSession, user_id: int, *, refresh_daily: bool = True) -> TokenSnapshot:
-    wallet = await _get_or_create_wallet(session, user_id)
-    if refresh_daily and _apply_daily_refill(wallet):
-        await session.flush()
-    return _to_snapshot(wallet)
+    """
+    Только чтение: ни блокировок строки, ни записи. refresh_daily=True отдаёт
+    эффективные суточные токены, False — то, что лежит в строке. Если кошелька
+    ещё нет, возвращается кошелёк по умолчанию; создаётся он при первом начислении
+    или списании.
+    """
+    snapshot = await _read_wallet(session, user_id, effective=refresh_daily)
+    return snapshot if snapshot is not None else _default_snapshot()
+
+
+@dataclass(slots=True)
+class UserWalletRow:
+    user_id: int
+    first_name: str | None
+    username: str | None
+    snapshot: TokenSnapshot
+
+
+async def get_user_wallets_page(
+    session: AsyncSession,
+    *,
+    limit: int,
+    after_id: int | None = None,
+    before_id: int | None = None,
+) -> list[UserWalletRow]:
+    """
+    Страница пользователей с кошельками одним запросом (users LEFT JOIN
+    user_token_wallets) и keyset-пагинацией по users.id вместо OFFSET:
+    after_id — следующая страница, before_id — предыдущая. Строки всегда
+    по возрастанию id. Пользователь без кошелька получает кошелёк по умолчанию.
+    """
+    query = select(User.id, User.first_name, User.username, *_WALLET_COLUMNS).outerjoin(
+        UserTokenWallet, UserTokenWallet.user_id == User.id
+    )
+    if before_id is not None:
+        query = query.where(User.id < before_id).order_by(User.id.desc())
+    else:
+        if after_id is not None:
+            query = query.where(User.id > after_id)
+        query = query.order_by(User.id)
+    rows = (await session.execute(query.limit(limit))).all()
+    if before_id is not None:
+        rows.reverse()
+    return [
+        UserWalletRow(
+            user_id=row.id,
+            first_name=row.first_name,
+            username=row.username,
+            snapshot=_to_snapshot(row) if row.daily_refill_date is not None else _default_snapshot(),
+        )
+        for row in rows
+    ]
 
 
 async def grant_welcome_token_x(session: AsyncSession, user_id: int, amount: int) -> TokenSnapshot:
     if amount <= 0:
         return await get_token_snapshot(session, user_id)
-
-    wallet = await _get_or_create_wallet(session, user_id)
-    _apply_daily_refill(wallet)
-    wallet.token_x += int(amount)
-    await session.flush()
-    return _to_snapshot(wallet)
+    return await _add_to_wallet(session, user_id, token_x=int(amount))
 
 
 async def add_bonus_tokens(session: AsyncSession, user_id: int, amount: int) -> TokenSnapshot:
     if amount <= 0:
         return await get_token_snapshot(session, user_id)
-
-    wallet = await _get_or_create_wallet(session, user_id)
-    _apply_daily_refill(wallet)
-    wallet.bonus_tokens += int(amount)
-    await session.flush()
-    return _to_snapshot(wallet)
+    return await _add_to_wallet(session, user_id, bonus_tokens=int(amount))
 
 
 async def add_token_x(session: AsyncSession, user_id: int, amount: int) -> TokenSnapshot:
     if amount <= 0:
         return await get_token_snapshot(session, user_id)
+    return await _add_to_wallet(session, user_id, token_x=int(amount))
 
-    wallet = await _get_or_create_wallet(session, user_id)
-    _apply_daily_refill(wallet)
-    wallet.token_x += int(amount)
-    await session.flush()
-    return _to_snapshot(wallet)
+
+async def _spend_atomic(
+    session: AsyncSession,
+    user_id: int,
+    build_update,
+    affordable,
+) -> tuple[bool, TokenSnapshot]:
+    """
+    Списание одним UPDATE ... WHERE <хватает> RETURNING; заодно записывает
+    отложенное суточное пополнение. Если строка не обновилась — кошелька нет или
+    не хватает средств: отсутствующий кошелёк создаём и повторяем списание один раз.
+    """
+    today = today_utc()
+    row = (await session.execute(build_update(today))).one_or_none()
+    if row is not None:
+        return True, _to_snapshot(row)
+
+    snapshot = await _read_wallet(session, user_id)
+    if snapshot is None:
+        await _create_wallet(session, user_id)
+        snapshot = _default_snapshot()
+    if not affordable(snapshot):
+        return False, snapshot
+    row = (await session.execute(build_update(today))).one_or_none()
+    if row is not None:
+        return True, _to_snapshot(row)
+    return False, snapshot
 
 
 async def spend_tokens(session: AsyncSession, user_id: int, amount: int) -> tuple[bool, TokenSnapshot]:
     if amount <= 0:
         return True, await get_token_snapshot(session, user_id)
 
-    wallet = await _get_or_create_wallet(session, user_id)
-    _apply_daily_refill(wallet)
+    def build_update(today: date):
+        daily = _refilled_daily_tokens(today)
+        from_daily = func.least(daily, amount)
+        return (
+            update(UserTokenWallet)
+            .where(UserTokenWallet.user_id == user_id, daily + UserTokenWallet.bonus_tokens >= amount)
+            .values(
+                daily_tokens=daily - from_daily,
+                bonus_tokens=UserTokenWallet.bonus_tokens - (amount - from_daily),
+                daily_refill_date=today,
+            )
+            .returning(*_WALLET_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
 
-    total = (wallet.daily_tokens or 0) + (wallet.bonus_tokens or 0)
-    if total < amount:
-        return False, _to_snapshot(wallet)
-
-    spend_from_daily = min(wallet.daily_tokens, amount)
-    wallet.daily_tokens -= spend_from_daily
-    wallet.bonus_tokens -= amount - spend_from_daily
-    await session.flush()
-    return True, _to_snapshot(wallet)
+    return await _spend_atomic(session, user_id, build_update, lambda snapshot: snapshot.total_tokens >= amount)
 
 
 async def refund_tokens(session: AsyncSession, user_id: int, amount: int) -> TokenSnapshot:
@@ -149,15 +276,20 @@ async def spend_token_x(session: AsyncSession, user_id: int, amount: int) -> tup
     if amount <= 0:
         return True, await get_token_snapshot(session, user_id)
 
-    wallet = await _get_or_create_wallet(session, user_id)
-    _apply_daily_refill(wallet)
+    def build_update(today: date):
+        return (
+            update(UserTokenWallet)
+            .where(UserTokenWallet.user_id == user_id, UserTokenWallet.token_x >= amount)
+            .values(
+                daily_tokens=_refilled_daily_tokens(today),
+                token_x=UserTokenWallet.token_x - amount,
+                daily_refill_date=today,
+            )
+            .returning(*_WALLET_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
 
-    if (wallet.token_x or 0) < amount:
-        return False, _to_snapshot(wallet)
-
-    wallet.token_x -= int(amount)
-    await session.flush()
-    return True, _to_snapshot(wallet)
+    return await _spend_atomic(session, user_id, build_update, lambda snapshot: snapshot.token_x >= amount)
 
 
 async def refund_token_x(session: AsyncSession, user_id: int, amount: int) -> TokenSnapshot:
@@ -200,7 +332,7 @@ async def _get_or_create_daily_social_usage(
 
 
 async def get_daily_social_usage(session: AsyncSession, user_id: int) -> int:
-    row = await _get_or_create_daily_social_usage(session, user_id, _today_utc())
+    row = await _get_or_create_daily_social_usage(session, user_id, today_utc())
     return int(row.used_count or 0)
 
 
@@ -208,14 +340,14 @@ async def increment_daily_social_usage(session: AsyncSession, user_id: int, amou
     if amount <= 0:
         return await get_daily_social_usage(session, user_id)
 
-    row = await _get_or_create_daily_social_usage(session, user_id, _today_utc())
+    row = await _get_or_create_daily_social_usage(session, user_id, today_utc())
     row.used_count += int(amount)
     await session.flush()
     return int(row.used_count)
 
 
 async def reset_daily_social_usage(session: AsyncSession, user_id: int) -> int:
-    row = await _get_or_create_daily_social_usage(session, user_id, _today_utc())
+    row = await _get_or_create_daily_social_usage(session, user_id, today_utc())
     row.used_count = 0
     await session.flush()
     return 0
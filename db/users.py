@@ -1,12 +1,15 @@
 import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, BigInteger, String, Boolean, func, select
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, BigInteger, String, Boolean, exists, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import relationship
 from sqlalchemy.exc import SQLAlchemyError
 
-from db.base import Base
+from db.base import Base, get_session
+
+# iter_user_ids: сколько id читается одним запросом
+USER_ID_CHUNK_SIZE = 1000
 
 
 class User(Base):
@@ -18,6 +21,7 @@ class User(Base):
     created_at: дата регистрации
     has_paid_ever: флаг «хоть раз платил»
     first_paid_at: дата первого платежа
+    bot_blocked_at: когда пользователь заблокировал бота (None — доступен для рассылок)
     activities: активности пользователя
     """
     __tablename__ = 'users'
@@ -27,6 +31,7 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     has_paid_ever = Column(Boolean, nullable=False, server_default="false")
     first_paid_at = Column(DateTime(timezone=True), nullable=True)
+    bot_blocked_at = Column(DateTime(timezone=True), nullable=True)
     referrer_id = Column(BigInteger, ForeignKey('users.id'), nullable=True)
     activities = relationship("UserActivity", back_populates="user", cascade="all, delete-orphan")
 
@@ -69,6 +74,7 @@ async def add_or_update_user(
         if user:
             user.first_name = first_name
             user.username = username
+            user.bot_blocked_at = None
             await session.commit()
             await session.refresh(user)
         else:
@@ -116,6 +122,92 @@ async def get_all_user_ids(
     return list(result.scalars().all())
 
 
+def _user_id_filters(
+    paid: bool | None = None,
+    active_since: datetime.datetime | None = None,
+    has_wallet: bool | None = None,
+    reachable: bool | None = None,
+) -> list:
+    """
+    WHERE-условия для выборок id: paid — has_paid_ever, active_since — была активность,
+    has_wallet — есть кошелёк, reachable — бот не заблокирован пользователем.
+    """
+    from db.tokens import UserTokenWallet
+
+    conditions = []
+    if paid is not None:
+        conditions.append(User.has_paid_ever.is_(paid))
+    if active_since is not None:
+        conditions.append(
+            exists().where(UserActivity.user_id == User.id, UserActivity.activity_date >= active_since)
+        )
+    if has_wallet is not None:
+        wallet_exists = exists().where(UserTokenWallet.user_id == User.id)
+        conditions.append(wallet_exists if has_wallet else ~wallet_exists)
+    if reachable is not None:
+        conditions.append(User.bot_blocked_at.is_(None) if reachable else User.bot_blocked_at.is_not(None))
+    return conditions
+
+
+async def count_user_ids(
+    session: AsyncSession,
+    *,
+    paid: bool | None = None,
+    active_since: datetime.datetime | None = None,
+    has_wallet: bool | None = None,
+    reachable: bool | None = None,
+) -> int:
+    """Количество пользователей под те же фильтры, что и у iter_user_ids."""
+    query = select(func.count(User.id)).where(*_user_id_filters(paid, active_since, has_wallet, reachable))
+    return int((await session.execute(query)).scalar_one() or 0)
+
+
+async def iter_user_ids(
+    chunk_size: int = USER_ID_CHUNK_SIZE,
+    *,
+    paid: bool | None = None,
+    active_since: datetime.datetime | None = None,
+    has_wallet: bool | None = None,
+    reachable: bool | None = None,
+) -> AsyncIterator[list[int]]:
+    """
+    Потоково отдаёт user_id пачками по chunk_size в порядке возрастания id — для
+    рассылок и других массовых задач. Память постоянна, первая пачка приходит сразу.
+
+    Пачки идут по ключу (id > последний), без OFFSET. Каждая пачка читается в своей
+    короткой сессии, и сессия закрывается до yield: пока потребитель рассылает,
+    соединение возвращено в пул и открытой транзакции нет.
+    """
+    conditions = _user_id_filters(paid, active_since, has_wallet, reachable)
+    last_id: int | None = None
+    while True:
+        query = select(User.id).where(*conditions)
+        if last_id is not None:
+            query = query.where(User.id > last_id)
+        query = query.order_by(User.id).limit(chunk_size)
+
+        async with get_session() as session:
+            chunk = list((await session.scalars(query)).all())
+        if not chunk:
+            return
+        last_id = chunk[-1]
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+
+
+async def mark_users_blocked(session: AsyncSession, user_ids: list[int]) -> None:
+    """Помечает пользователей, заблокировавших бота, одним UPDATE. Коммит остаётся за вызывающим."""
+    if not user_ids:
+        return
+    await session.execute(
+        update(User)
+        .where(User.id.in_(user_ids), User.bot_blocked_at.is_(None))
+        .values(bot_blocked_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
 async def get_total_users(session: AsyncSession) -> int:
     """Возвращает общее количество пользователей."""
     return await session.scalar(select(func.count(User.id)))
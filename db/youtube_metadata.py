@@ -0,0 +1,125 @@
+"""Кэш метаданных YouTube-видео (название, длительность, превью, список mp4-форматов).
+
+Ключ — video id. Перед таблицей стоит in-memory TTLCache; свежесть записи решает
+вызывающий код по возрасту (fetched_at), см. youtube_utils.load_video_options.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import Column, DateTime, Integer, String, select
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import YOUTUBE_METADATA_MEMORY_SIZE, YOUTUBE_METADATA_STALE_TTL_SECONDS
+from db.base import Base
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+_missing_table_warned = False
+
+# video id -> (info, fetched_at); дольше stale-TTL запись не нужна ни в памяти, ни в БД
+_memory_cache = TTLCache(YOUTUBE_METADATA_MEMORY_SIZE, YOUTUBE_METADATA_STALE_TTL_SECONDS)
+
+
+class YouTubeMetadata(Base):
+    __tablename__ = "youtube_metadata"
+
+    video_id = Column(String(32), primary_key=True)
+    title = Column(String(512), nullable=False, default="")
+    thumbnail_url = Column(String(1024), nullable=True)
+    duration_seconds = Column(Integer, nullable=False, default=0)
+    formats = Column(JSONB, nullable=False, default=list)
+    fetched_at = Column(DateTime(timezone=True), nullable=False)
+
+
+def _is_table_missing(exc: ProgrammingError) -> bool:
+    sqlstate = getattr(getattr(exc, "orig", None), "sqlstate", None)
+    if sqlstate == "42P01":
+        return True
+    text = str(exc).lower()
+    return "undefinedtableerror" in text or 'relation "youtube_metadata" does not exist' in text
+
+
+def _warn_missing_table_once() -> None:
+    global _missing_table_warned
+    if not _missing_table_warned:
+        logger.warning("youtube_metadata table is missing in current DB. Metadata cache uses memory only.")
+        _missing_table_warned = True
+
+
+def get_youtube_metadata_stats() -> dict[str, int]:
+    """Счётчики in-memory кэша метаданных: size, hits, misses."""
+    return _memory_cache.stats()
+
+
+async def get_youtube_metadata(
+    session: AsyncSession,
+    video_id: str,
+) -> tuple[dict[str, Any], float] | None:
+    """
+    Возвращает (info, age_seconds) или None. info имеет тот же вид, что
+    YTDLPDownloader.get_available_video_options: title, thumbnail_url, duration_seconds, formats.
+    """
+    now = datetime.now(timezone.utc)
+    cached = _memory_cache.get(video_id)
+    if cached is not None:
+        info, fetched_at = cached
+        return info, (now - fetched_at).total_seconds()
+
+    try:
+        row = (
+            await session.execute(select(YouTubeMetadata).where(YouTubeMetadata.video_id == video_id))
+        ).scalar_one_or_none()
+    except ProgrammingError as exc:
+        if _is_table_missing(exc):
+            await session.rollback()
+            _warn_missing_table_once()
+            return None
+        raise
+    if row is None:
+        return None
+
+    age = (now - row.fetched_at).total_seconds()
+    if age >= YOUTUBE_METADATA_STALE_TTL_SECONDS:
+        return None
+    info = {
+        "title": row.title,
+        "thumbnail_url": row.thumbnail_url,
+        "duration_seconds": int(row.duration_seconds or 0),
+        "formats": list(row.formats or []),
+    }
+    _memory_cache.set(video_id, (info, row.fetched_at), ttl=YOUTUBE_METADATA_STALE_TTL_SECONDS - age)
+    return info, age
+
+
+async def upsert_youtube_metadata(session: AsyncSession, video_id: str, info: dict[str, Any]) -> None:
+    """Сохраняет свежие метаданные (одним INSERT ... ON CONFLICT DO UPDATE) и кладёт их в память."""
+    fetched_at = datetime.now(timezone.utc)
+    values = {
+        "video_id": video_id,
+        "title": (info.get("title") or "")[:512],
+        "thumbnail_url": (info.get("thumbnail_url") or None),
+        "duration_seconds": int(info.get("duration_seconds") or 0),
+        "formats": info.get("formats") or [],
+        "fetched_at": fetched_at,
+    }
+    _memory_cache.set(video_id, (info, fetched_at))
+    stmt = pg_insert(YouTubeMetadata).values(**values)
+    try:
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[YouTubeMetadata.video_id],
+                set_={key: stmt.excluded[key] for key in values if key != "video_id"},
+            )
+        )
+    except ProgrammingError as exc:
+        if _is_table_missing(exc):
+            await session.rollback()
+            _warn_missing_table_once()
+            return
+        raise
@@ -12,9 +12,16 @@ import asyncio
 from contextlib import suppress
 import logging
 from db.base import get_session
-from db.users import get_all_user_ids
+from db.users import count_user_ids, iter_user_ids
 from utils.keyboards import back_button
-from config import BROADCAST_PROGRESS_UPDATE_INTERVAL, BROADCAST_PER_MESSAGE_DELAY
+from config import (
+    BROADCAST_BURST,
+    BROADCAST_MAX_RETRIES,
+    BROADCAST_PROGRESS_UPDATE_INTERVAL,
+    BROADCAST_RATE_PER_SECOND,
+    BROADCAST_WORKERS,
+)
+from utils.broadcast import BroadcastEngine, BroadcastStats
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -165,60 +172,65 @@ async def send_broadcast(callback: CallbackQuery, state: FSMContext, bot: Bot):
     await callback.answer()
 
 async def _send_task(bot: Bot, admin_id: int, data: dict):
-    """Выполняет массовую отправку сообщений всем пользователям."""
-    from db.base import get_session
-    from db.users import get_all_user_ids
+    """Выполняет массовую отправку сообщений всем пользователям через BroadcastEngine."""
     text = data.get("text")
     markup = _make_markup(data.get("button_text"), data.get("button_url"))
     media_id, media_type = data.get("media_id"), data.get("media_type")
-    sent = failed = 0
     async with get_session() as session:
-        user_ids = await get_all_user_ids(session)
-    if not user_ids:
+        total = await count_user_ids(session, reachable=True)
+    if not total:
         await bot.send_message(admin_id, "❗️ Аудитория пуста. Сообщение никому не отправлено.")
         return
-    total = len(user_ids)
     logger.info("📢 [BROADCAST] Начинается рассылка для %s пользователей.", total)
     progress_msg = await bot.send_message(admin_id, _render_progress_bar(0, total))
-    last_update = asyncio.get_event_loop().time()
-    for user_id in user_ids:
-        try:
-            if media_id and media_type == "photo":
-                await bot.send_photo(user_id, media_id, caption=text, reply_markup=markup)
-            elif media_id and media_type == "video":
-                await bot.send_video(user_id, media_id, caption=text, reply_markup=markup)
-            else:
-                await bot.send_message(user_id, text, reply_markup=markup)
-            sent += 1
-        except TelegramAPIError as e:
-            error_text = str(e)
-            logger.info("🚫 [BROADCAST] TelegramAPIError: %s", error_text)
-            failed += 1
-        except Exception as e:
-            logger.error("🚫 [BROADCAST] Неизвестная ошибка при отправке пользователю %s: %s", user_id, e, exc_info=True)
-            failed += 1
-        now = asyncio.get_event_loop().time()
-        if (sent % 100 == 0 or sent == total) or (now - last_update > BROADCAST_PROGRESS_UPDATE_INTERVAL):
-            with suppress(TelegramAPIError):
-                await bot.edit_message_text(
-                    text=_render_progress_bar(sent, total),
-                    chat_id=admin_id,
-                    message_id=progress_msg.message_id
-                )
-            last_update = now
-        await asyncio.sleep(BROADCAST_PER_MESSAGE_DELAY)
 
-    logger.info("✅ [BROADCAST] Рассылка завершена. Отправлено=%s Ошибок=%s", sent, failed)
-    percent = int(sent / total * 100) if total else 0
+    async def send(user_id: int):
+        if media_id and media_type == "photo":
+            return await bot.send_photo(user_id, media_id, caption=text, reply_markup=markup)
+        if media_id and media_type == "video":
+            return await bot.send_video(user_id, media_id, caption=text, reply_markup=markup)
+        return await bot.send_message(user_id, text, reply_markup=markup)
+
+    async def on_progress(stats: BroadcastStats):
+        with suppress(TelegramAPIError):
+            await bot.edit_message_text(
+                text=_render_progress_bar(stats.processed, total, rate=stats.current_rate),
+                chat_id=admin_id,
+                message_id=progress_msg.message_id
+            )
+
+    engine = BroadcastEngine(
+        send,
+        rate=BROADCAST_RATE_PER_SECOND,
+        burst=BROADCAST_BURST,
+        workers=BROADCAST_WORKERS,
+        max_retries=BROADCAST_MAX_RETRIES,
+    )
+    # id читаются пачками по ходу рассылки, весь список в память не грузится
+    user_ids = (user_id async for chunk in iter_user_ids(reachable=True) for user_id in chunk)
+    stats = await engine.run(
+        user_ids,
+        total=total,
+        on_progress=on_progress,
+        progress_interval=BROADCAST_PROGRESS_UPDATE_INTERVAL,
+    )
+
+    logger.info(
+        "✅ [BROADCAST] Рассылка завершена. Отправлено=%s Ошибок=%s Заблокировали=%s",
+        stats.sent, stats.failed, stats.blocked,
+    )
+    percent = int(stats.sent / total * 100) if total else 0
     summary_text = (
         f"🔗 [ОБЩАЯ РАССЫЛКА] Завершена!\n\n"
         f"👥 Всего пользователей: {total}\n"
-        f"✅ Доставлено: {sent} ({percent}%)\n"
-        f"❌ Не доставлено: {failed}"
+        f"✅ Доставлено: {stats.sent} ({percent}%)\n"
+        f"❌ Не доставлено: {stats.failed}\n"
+        f"⛔️ Заблокировали бота: {stats.blocked}\n"
+        f"⚡️ Скорость: {stats.average_rate:.1f} msg/s, время {int(stats.elapsed)}с"
     )
     with suppress(TelegramAPIError):
         await bot.edit_message_text(
-            text=_render_progress_bar(sent, total),
+            text=_render_progress_bar(stats.processed, total),
             chat_id=admin_id,
             message_id=progress_msg.message_id
         )
@@ -230,12 +242,13 @@ def _make_markup(button_text, button_url):
         return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=button_text, url=button_url)]])
     return None
 
-def _render_progress_bar(sent, total, bar_length=10):
-    """Рендерит прогресс-бар рассылки."""
-    percent = sent / total if total else 0
+def _render_progress_bar(sent, total, bar_length=10, rate=None):
+    """Рендерит прогресс-бар рассылки (и текущую скорость, если передана)."""
+    percent = min(sent / total, 1) if total else 0
     filled = int(bar_length * percent)
     bar = '🟩' * filled + '⬜' * (bar_length - filled)
-    return f"Прогресс: [{bar}] {int(percent*100)}% ({sent}/{total})"
+    speed = f"\n⚡️ {rate:.1f} msg/s" if rate is not None else ""
+    return f"Прогресс: [{bar}] {int(percent*100)}% ({sent}/{total}){speed}"
 
 async def _cleanup(message: Message, state: FSMContext, bot: Bot):
     """Удаляет временные сообщения и обновляет конструктор."""
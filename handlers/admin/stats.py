@@ -5,12 +5,17 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder, InlineKeyboardButton
 
 import logging
 from db.base import get_session
+from db.media_cache import get_media_cache_stats
 from db.platforms import get_top_platform_downloads
 from db.tokens import get_total_bonus_tokens, get_total_token_x, get_wallets_count
 from db.users import (
     get_active_users_today,
     get_new_users_count_for_period, get_total_users
 )
+from db.youtube_metadata import get_youtube_metadata_stats
+from services.ytdlp_pool import ytdlp_pool
+from utils.download_files.admission import download_admission
+from utils.executors import get_executor_stats
 
 
 router = Router()
@@ -76,6 +81,48 @@ async def handle_stats(callback: CallbackQuery) -> None:
         count = top_downloads.get(platform, 0)
         text += f"{platform_emojis[platform]}: <b>{count}</b>\n"
 
+    cache_stats = get_media_cache_stats()
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    hit_ratio = (cache_stats["hits"] / lookups * 100) if lookups else 0
+    text += (
+        "\n<b>⚡️ Кэш file_id (память):</b> "
+        f"<b>{cache_stats['size']}</b> записей, попаданий {cache_stats['hits']}, "
+        f"промахов {cache_stats['misses']} ({hit_ratio:.1f}%)\n"
+    )
+    meta_stats = get_youtube_metadata_stats()
+    text += (
+        "<b>🎬 Кэш метаданных YouTube (память):</b> "
+        f"<b>{meta_stats['size']}</b> записей, попаданий {meta_stats['hits']}, промахов {meta_stats['misses']}\n"
+    )
+
+    admission = download_admission.stats()
+    text += (
+        "\n<b>🚦 Загрузки:</b> "
+        f"в работе <b>{admission['active']}</b>/{admission['limit']}, "
+        f"в очереди <b>{admission['queued']}</b>, "
+        f"ожидание avg {admission['wait_avg']:.1f}с / p95 {admission['wait_p95']:.1f}с / "
+        f"max {admission['wait_max']:.1f}с\n"
+    )
+    for platform, active in sorted(admission["active_by_platform"].items()):
+        queued = admission["queued_by_platform"].get(platform, 0)
+        text += f"{platform}: {active} в работе, {queued} в очереди\n"
+    for priority, wait_p95 in sorted(admission["wait_p95_by_priority"].items()):
+        queued = admission["queued_by_priority"].get(priority, 0)
+        text += f"{priority}: {queued} в очереди, ожидание p95 {wait_p95:.1f}с\n"
+
+    text += "\n<b>🧵 Пулы потоков:</b>\n"
+    for pool in get_executor_stats():
+        text += (
+            f"{pool['name']}: {pool['running']}/{pool['workers']} в работе, "
+            f"очередь <b>{pool['queued']}</b>, ожидание avg {pool['wait_avg']:.2f}с / "
+            f"p95 {pool['wait_p95']:.2f}с / max {pool['wait_max']:.2f}с\n"
+        )
+    ydl_pool = ytdlp_pool.stats()
+    text += (
+        f"yt-dlp: создано {ydl_pool['created']}, переиспользовано {ydl_pool['reused']}, "
+        f"в пуле {ydl_pool['idle']}\n"
+    )
+
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="admin_menu"))
 
@@ -7,14 +7,12 @@ from aiogram import F, Router, types
 from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder, InlineKeyboardButton
-from utils.keyboards import pagination_keyboard
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import ADMINS
 from db.base import get_session
-from db.tokens import get_token_snapshot
-from db.users import (delete_user_by_id, get_all_user_ids, get_total_users,
-                    get_users_by_ids)
+from db.tokens import get_user_wallets_page
+from db.users import delete_user_by_id, get_all_user_ids, get_total_users
 
 
 logger = logging.getLogger(__name__)
@@ -27,8 +25,14 @@ USERS_PER_PAGE = 20
 
 
 class UsersPageCallback(CallbackData, prefix="users_page"):
-    """Фабрика колбэков для пагинации пользователей."""
+    """
+    Фабрика колбэков для пагинации пользователей: номер страницы, курсор по id и
+    число пользователей, посчитанное при открытии списка (COUNT(*) не повторяется на каждой странице).
+    """
     page: int
+    after_id: int = 0
+    before_id: int = 0
+    total: int = 0
 
 
 class ConfirmDeleteAllCallback(CallbackData, prefix="confirm_delete_all"):
@@ -51,33 +55,69 @@ async def manage_users_menu(callback: types.CallbackQuery):
     )
     await callback.answer()
 
-async def _get_users_page_markup(session: AsyncSession, page: int = 1) -> tuple[str, InlineKeyboardMarkup]:
+async def _get_users_page_markup(
+    session: AsyncSession,
+    page: int = 1,
+    after_id: int = 0,
+    before_id: int = 0,
+    total_users: int | None = None,
+) -> tuple[str, InlineKeyboardMarkup]:
     """
     Возвращает текст и клавиатуру для страницы пользователей. Упрощённая и дружелюбная версия.
+    Пользователи и кошельки читаются одним запросом; страницы листаются по курсору
+    (id крайнего пользователя), поэтому дальние страницы не дороже первой.
+    total_users считается один раз при открытии списка и дальше передаётся в колбэке.
     """
-    total_users = await get_total_users(session)
+    if total_users is None:
+        total_users = await get_total_users(session)
     total_pages = max(1, ceil(total_users / USERS_PER_PAGE))
-    offset = (page - 1) * USERS_PER_PAGE
 
-    user_ids = await get_all_user_ids(session, limit=USERS_PER_PAGE, offset=offset)
-    users = await get_users_by_ids(session, user_ids)
+    # Берём на одну строку больше, чтобы понять, есть ли страница дальше по направлению
+    rows = await get_user_wallets_page(
+        session,
+        limit=USERS_PER_PAGE + 1,
+        after_id=after_id or None,
+        before_id=before_id or None,
+    )
+    more = len(rows) > USERS_PER_PAGE
+    if before_id:
+        rows = rows[-USERS_PER_PAGE:]
+        has_prev, has_next = more, True
+        if not more:
+            page = 1
+    else:
+        rows = rows[:USERS_PER_PAGE]
+        has_prev, has_next = page > 1, more
 
-    if not users:
+    if not rows:
         text = "❌ <b>Пользователей пока нет.</b>"
     else:
         text = "<b>👥 Список пользователей</b>\n\n"
-        for user in users:
-            snapshot = await get_token_snapshot(session, user.id, refresh_daily=True)
+        for row in rows:
+            snapshot = row.snapshot
             status_icon = "💠" if snapshot.token_x > 0 else "🪙"
-            username = f" (@{user.username})" if user.username else ""
+            username = f" (@{row.username})" if row.username else ""
             text += (
-                f"{status_icon} <code>{user.id}</code> — {user.first_name}{username} "
+                f"{status_icon} <code>{row.user_id}</code> — {row.first_name}{username} "
                 f"(T:{snapshot.total_tokens} TX:{snapshot.token_x})\n"
             )
 
-    await session.commit()
-    nav = pagination_keyboard(page, total_pages, prefix="users_page", extra_buttons=[("⬅️ Назад", "manage_users")])
-    return text, nav
+    builder = InlineKeyboardBuilder()
+    if rows and has_prev:
+        builder.button(
+            text="⬅️",
+            callback_data=UsersPageCallback(page=max(1, page - 1), before_id=rows[0].user_id, total=total_users).pack(),
+        )
+    # Число пользователей зафиксировано при открытии списка и могло устареть
+    total_pages = max(total_pages, page + 1 if has_next else page)
+    builder.button(text=f"{page}/{total_pages}", callback_data="noop")
+    if rows and has_next:
+        builder.button(
+            text="➡️",
+            callback_data=UsersPageCallback(page=page + 1, after_id=rows[-1].user_id, total=total_users).pack(),
+        )
+    builder.button(text="⬅️ Назад", callback_data="manage_users")
+    return text, builder.as_markup()
 
 @router.callback_query(F.data == "all_users")
 async def list_users_handler(callback: types.CallbackQuery) -> None:
@@ -96,9 +136,15 @@ async def paginate_users_handler(callback: types.CallbackQuery, callback_data: U
     """
     Обрабатывает переключение страниц списка пользователей.
     """
-    page = callback_data.page
     async with get_session() as session:
-        text, builder = await _get_users_page_markup(session, page)
+        text, builder = await _get_users_page_markup(
+            session,
+            callback_data.page,
+            after_id=callback_data.after_id,
+            before_id=callback_data.before_id,
+            # Старые кнопки без total — посчитаем заново
+            total_users=callback_data.total or None,
+        )
         await callback.message.edit_text(
             text, parse_mode="HTML", reply_markup=builder
         )
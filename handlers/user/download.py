@@ -3,7 +3,7 @@ from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 
 from config import ADMINS
-from utils.download_files.clean_url import strip_url_after_ampersand
+from utils.download_files.clean_url import resolve_canonical_url
 from utils.platform_detect import detect_platform
 from utils.download_files.download_manager import (
     is_busy, set_busy, check_download_permissions, process_youtube_or_other
@@ -17,7 +17,6 @@ router = Router()
 @router.message(F.text.regexp(r'https?://'))
 async def download_handler(message: types.Message, state: FSMContext):
     """Обрабатывает ссылку на скачивание, применяет лимиты и проверки."""
-    url = strip_url_after_ampersand(message.text.strip())
     user = message.from_user
 
     # Проверка на параллельную загрузку
@@ -28,7 +27,10 @@ async def download_handler(message: types.Message, state: FSMContext):
     wait_message = await message.answer("⏳ Секунду...")
 
     try:
-        platform = detect_platform(url)
+        # Каноническая ссылка: один ключ кэша/истории для youtu.be, shorts, vt.tiktok.com и т.п.
+        canonical = await resolve_canonical_url(message.text.strip())
+        url = canonical.url
+        platform = canonical.platform if canonical.platform != "unknown" else detect_platform(url)
         # Проверка лимитов и обязательных каналов
         can_download, reason = await check_download_permissions(user.id, platform, message.bot)
         if not can_download:
@@ -9,6 +9,7 @@ from sqlalchemy import select, func
 from db.base import get_session
 from db.users import User, get_ref_link
 from config import REFERRAL_BONUS_TOKENS, REFERRAL_BONUS_TOKEN_X
+from utils.bot_profile import get_bot_username
 
 
 router = Router()
@@ -45,7 +46,7 @@ def referral_keyboard(ref_link: str):
 
 @router.callback_query(F.data == "invite_friend")
 async def invite_friend_callback(callback: CallbackQuery, bot: Bot):
-    ref_link = get_ref_link((await bot.me()).username, callback.from_user.id)
+    ref_link = get_ref_link(await get_bot_username(bot), callback.from_user.id)
     text = await get_referral_text(callback.from_user.id)
     await callback.message.edit_text(text, parse_mode="HTML", reply_markup=referral_keyboard(ref_link))
     await callback.answer()
@@ -53,6 +54,6 @@ async def invite_friend_callback(callback: CallbackQuery, bot: Bot):
 
 @router.message(Command("invite"))
 async def invite_friend_command(message: Message, bot: Bot):
-    ref_link = get_ref_link((await bot.me()).username, message.from_user.id)
+    ref_link = get_ref_link(await get_bot_username(bot), message.from_user.id)
     text = await get_referral_text(message.from_user.id)
     await message.answer(text, parse_mode="HTML", reply_markup=referral_keyboard(ref_link))
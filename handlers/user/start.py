@@ -20,6 +20,7 @@ from config import (
 )
 from handlers.user.menu import MAIN_MENU_TEXT, get_main_menu_keyboard
 from handlers.user.tokens import build_profile_block
+from utils.bot_profile import get_bot_profile
 
 logger = logging.getLogger(__name__)
 
@@ -113,7 +114,7 @@ async def start_flow(event: Union[Message, CallbackQuery]):
     # referrer
     referrer_id = parse_ref_args(msg, user_id)
 
-    bot_user = await msg.bot.get_me()
+    bot_user = await get_bot_profile(msg.bot)
     if user_id == bot_user.id:
         return
 
@@ -15,6 +15,7 @@ from db.users import mark_user_has_paid
 import uuid
 from loader import crypto_pay
 from utils.currency import rub_to_usdt
+from utils.bot_profile import get_bot_username
 
 
 logger = logging.getLogger(__name__)
@@ -178,12 +179,12 @@ async def pay_yookassa_callback_handler(callback: types.CallbackQuery) -> None:
 
     try:
         from utils.payment import create_payment
-        me = await callback.bot.get_me()
+        bot_username = await get_bot_username(callback.bot)
         payment_url, payment_id = create_payment(
             user_id=user_id,
             amount=tariff.price,
             description=f"Пакет tokenX: {tariff.name}",
-            bot_username=me.username or "bot",
+            bot_username=bot_username or "bot",
             metadata={
                 "user_id": str(user_id),
                 "tariff_id": str(tariff.id)
@@ -0,0 +1,128 @@
+"""Бенчмарк записи статистики скачивания: старый путь vs record_download.
+
+Считает SQL-запросы (round trips), коммиты и среднее время на одно скачивание.
+Работает с БД из DATABASE_URL на отдельном синтетическом пользователе и удаляет
+его данные по завершении.
+
+    python -m scripts.bench_record_download --iterations 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import delete, event
+
+from db.base import engine, get_session
+from db.downloads import (
+    DailyDownload,
+    DownloadLink,
+    TotalDownload,
+    add_download_link,
+    get_or_create_total_download,
+    increment_daily_download,
+    record_download,
+)
+from db.platforms import PlatformDownload, increment_platform_download
+from db.tokens import DailySocialUsage, increment_daily_social_usage
+from db.users import User, UserActivity, add_or_update_user, log_user_activity
+
+BENCH_USER_ID = -424242
+BENCH_URL = "https://www.tiktok.com/@bench/video/1"
+
+
+class _Counter:
+    def __init__(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+    def on_execute(self, *_args, **_kwargs) -> None:
+        self.statements += 1
+
+    def on_commit(self, *_args, **_kwargs) -> None:
+        self.commits += 1
+
+
+async def _legacy_path(platform: str) -> None:
+    async with get_session() as session:
+        await add_or_update_user(session, BENCH_USER_ID, "bench", "bench")
+        await log_user_activity(session, BENCH_USER_ID)
+        await increment_daily_download(session, BENCH_USER_ID)
+        total_row = await get_or_create_total_download(session, BENCH_USER_ID)
+        total_row.total += 1
+        await add_download_link(session, BENCH_USER_ID, BENCH_URL)
+        await increment_platform_download(session, BENCH_USER_ID, platform)
+        if platform in {"tiktok", "instagram"}:
+            await increment_daily_social_usage(session, BENCH_USER_ID)
+        await session.commit()
+
+
+async def _batched_path(platform: str) -> None:
+    async with get_session() as session:
+        await record_download(session, BENCH_USER_ID, platform, BENCH_URL, first_name="bench", username="bench")
+        await session.commit()
+
+
+async def _cleanup() -> None:
+    async with get_session() as session:
+        for model, column in (
+            (DownloadLink, DownloadLink.user_id),
+            (DailyDownload, DailyDownload.user_id),
+            (TotalDownload, TotalDownload.user_id),
+            (PlatformDownload, PlatformDownload.user_id),
+            (DailySocialUsage, DailySocialUsage.user_id),
+            (UserActivity, UserActivity.user_id),
+            (User, User.id),
+        ):
+            await session.execute(delete(model).where(column == BENCH_USER_ID))
+        await session.commit()
+
+
+async def _measure(name: str, fn, iterations: int, platform: str) -> None:
+    counter = _Counter()
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", counter.on_execute)
+    event.listen(sync_engine, "commit", counter.on_commit)
+    timings: list[float] = []
+    try:
+        await fn(platform)  # прогрев: создание строк и соединений пула
+        counter.statements = counter.commits = 0
+        for _ in range(iterations):
+            started = time.perf_counter()
+            await fn(platform)
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", counter.on_execute)
+        event.remove(sync_engine, "commit", counter.on_commit)
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1] if timings else 0.0
+    print(
+        f"{name:<16} statements/op={counter.statements / iterations:5.1f} "
+        f"commits/op={counter.commits / iterations:4.1f} "
+        f"mean={statistics.mean(timings):7.2f}ms p50={statistics.median(timings):7.2f}ms p95={p95:7.2f}ms"
+    )
+
+
+async def run(iterations: int, platform: str) -> None:
+    await _cleanup()
+    try:
+        await _measure("legacy", _legacy_path, iterations, platform)
+        await _measure("record_download", _batched_path, iterations, platform)
+    finally:
+        await _cleanup()
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--platform", default="tiktok")
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations, args.platform))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
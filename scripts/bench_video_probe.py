@@ -0,0 +1,48 @@
+"""Микро-бенчмарк определения разрешения видео: MP4-боксы vs ffprobe vs moviepy.
+
+    python -m scripts.bench_video_probe downloads/sample1.mp4 downloads/sample2.mp4 --iterations 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from utils.download_files.video_utils import probe_ffprobe, probe_moviepy, probe_mp4
+
+
+async def _time_call(fn, path: str, iterations: int) -> tuple[float, object]:
+    timings: list[float] = []
+    result = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = fn(path)
+        if asyncio.iscoroutine(result):
+            result = await result
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+async def run(paths: list[str], iterations: int, skip_moviepy: bool) -> None:
+    methods = [("mp4 boxes", probe_mp4), ("ffprobe", probe_ffprobe)]
+    if not skip_moviepy:
+        methods.append(("moviepy", probe_moviepy))
+    for path in paths:
+        print(path)
+        for name, fn in methods:
+            median_ms, info = await _time_call(fn, path, iterations)
+            print(f"  {name:<10} median={median_ms:9.3f}ms  -> {info}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--skip-moviepy", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.paths, args.iterations, args.skip_moviepy))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
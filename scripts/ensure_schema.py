@@ -1,8 +1,11 @@
 """Быстрый сценарий инициализации БД БЕЗ Alembic миграций.
 Логика:
-1. Пытаемся прочитать alembic_version — если таблица есть, считаем что используется Alembic и просто выходим.
+1. Пытаемся прочитать alembic_version — если таблица есть, считаем что используется Alembic:
+   добавляем только колонки из ADDED_COLUMNS и выходим (новые таблицы — через
+   `alembic revision --autogenerate`).
 2. Если таблицы alembic_version нет – создаём ВСЕ таблицы из Base.metadata (import db).
-3. Повторный запуск безопасен (create_all идемпотентно).
+3. Добавляем колонки, появившиеся в моделях позже создания таблиц (ADD COLUMN IF NOT EXISTS).
+4. Повторный запуск безопасен (create_all и ADD COLUMN IF NOT EXISTS идемпотентны).
 """
 from __future__ import annotations
 
@@ -13,6 +16,16 @@ from sqlalchemy.exc import SQLAlchemyError
 from db.base import engine, Base
 import db  # noqa: F401  # импорт моделей чтобы они попали в metadata
 
+# create_all не меняет существующие таблицы — новые колонки добавляем явно
+ADDED_COLUMNS = [
+    "ALTER TABLE IF EXISTS users ADD COLUMN IF NOT EXISTS bot_blocked_at TIMESTAMP WITH TIME ZONE",
+]
+
+
+async def _add_columns(conn) -> None:
+    for statement in ADDED_COLUMNS:
+        await conn.execute(text(statement))
+
 
 async def ensure_schema() -> None:
     async with engine.begin() as conn:
@@ -24,11 +37,13 @@ async def ensure_schema() -> None:
             await conn.rollback()
 
         if has_alembic:
-            print("[ensure_schema] Alembic detected (alembic_version table exists) — skip create_all().")
+            await _add_columns(conn)
+            print("[ensure_schema] Alembic detected (alembic_version table exists) — skip create_all(), колонки добавлены.")
             return
 
         print("[ensure_schema] alembic_version отсутствует — создаём таблицы через Base.metadata.create_all()")
         await conn.run_sync(Base.metadata.create_all)
+        await _add_columns(conn)
         print("[ensure_schema] Done.")
 
 
@@ -0,0 +1,124 @@
+"""Перевод media_cache и истории ссылок на канонические URL (clean_url.canonicalize_url).
+
+Строки media_cache с неканоническим url переключаются на канонический ключ. Если
+строка с таким ключом уже есть, неканоническая удаляется (file_id тот же ролик).
+В user_download_links url просто переписывается. Повторный запуск безопасен.
+
+    python -m scripts.rekey_media_cache --dry-run
+    python -m scripts.rekey_media_cache --resolve-short-links
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from sqlalchemy import delete, select, update
+
+from db.base import get_session
+from db.downloads import DownloadLink
+from db.media_cache import MediaCache
+from utils.download_files.clean_url import canonicalize_url, resolve_canonical_url, short_link_resolver
+
+BATCH_SIZE = 500
+
+
+async def _canonical(url: str, resolve_short_links: bool) -> str:
+    if resolve_short_links:
+        return (await resolve_canonical_url(url)).url
+    return canonicalize_url(url).url
+
+
+async def rekey_media_cache(dry_run: bool, resolve_short_links: bool) -> tuple[int, int]:
+    """Возвращает (перенесено, удалено дублей)."""
+    moved = dropped = 0
+    last_id = 0
+    while True:
+        async with get_session() as session:
+            rows = (
+                await session.execute(
+                    select(MediaCache.id, MediaCache.url, MediaCache.media_type, MediaCache.quality)
+                    .where(MediaCache.id > last_id)
+                    .order_by(MediaCache.id)
+                    .limit(BATCH_SIZE)
+                )
+            ).all()
+            if not rows:
+                return moved, dropped
+            last_id = rows[-1].id
+            for row in rows:
+                target = (await _canonical(row.url, resolve_short_links))[:1024]
+                if target == row.url:
+                    continue
+                existing = (
+                    await session.execute(
+                        select(MediaCache.id).where(
+                            MediaCache.url == target,
+                            MediaCache.media_type == row.media_type,
+                            MediaCache.quality == row.quality,
+                        )
+                    )
+                ).scalar_one_or_none()
+                if existing is not None:
+                    dropped += 1
+                    if not dry_run:
+                        await session.execute(delete(MediaCache).where(MediaCache.id == row.id))
+                else:
+                    moved += 1
+                    if not dry_run:
+                        await session.execute(update(MediaCache).where(MediaCache.id == row.id).values(url=target))
+            if not dry_run:
+                await session.commit()
+
+
+async def rekey_download_links(dry_run: bool, resolve_short_links: bool) -> int:
+    changed = 0
+    last_id = 0
+    while True:
+        async with get_session() as session:
+            rows = (
+                await session.execute(
+                    select(DownloadLink.id, DownloadLink.url)
+                    .where(DownloadLink.id > last_id)
+                    .order_by(DownloadLink.id)
+                    .limit(BATCH_SIZE)
+                )
+            ).all()
+            if not rows:
+                return changed
+            last_id = rows[-1].id
+            for row in rows:
+                target = (await _canonical(row.url, resolve_short_links))[:1024]
+                if target == row.url:
+                    continue
+                changed += 1
+                if not dry_run:
+                    await session.execute(update(DownloadLink).where(DownloadLink.id == row.id).values(url=target))
+            if not dry_run:
+                await session.commit()
+
+
+async def run(dry_run: bool, resolve_short_links: bool) -> None:
+    try:
+        moved, dropped = await rekey_media_cache(dry_run, resolve_short_links)
+        links = await rekey_download_links(dry_run, resolve_short_links)
+    finally:
+        await short_link_resolver.close()
+    prefix = "[dry-run] " if dry_run else ""
+    print(f"{prefix}media_cache: перенесено {moved}, удалено дублей {dropped}")
+    print(f"{prefix}user_download_links: обновлено {links}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать изменения")
+    parser.add_argument(
+        "--resolve-short-links",
+        action="store_true",
+        help="раскрывать vt./vm.tiktok.com по сети (медленно)",
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.dry_run, args.resolve_short_links))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
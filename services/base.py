@@ -1,8 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, TypeVar
+
+from config import DOWNLOAD_RETRY_ATTEMPTS, DOWNLOAD_RETRY_BASE_DELAY, DOWNLOAD_RETRY_MAX_DELAY
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Коды ошибок, при которых повтор бессмысленен: результат не изменится
+PERMANENT_ERRORS = frozenset({"LOGIN_REQUIRED", "IP_BLOCKED", "AGE_RESTRICTED"})
+
+
+@dataclass(slots=True)
+class DownloadResult:
+    """
+    Результат скачивания: путь к файлу и то, что загрузчик уже знает о медиа
+    (размеры, длительность, размер файла, mime, id исходного формата).
+    remote_url вместо path — медиа не сохранялось на диск и отправляется потоком по ссылке.
+    При ошибке path=None, а error содержит код: FAILED, LOGIN_REQUIRED, IP_BLOCKED, AGE_RESTRICTED.
+    """
+    path: str | None = None
+    remote_url: str | None = None
+    width: int | None = None
+    height: int | None = None
+    duration: float | None = None
+    size: int | None = None
+    mime_type: str | None = None
+    format_id: str | None = None
+    error: str | None = None
+    error_message: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and bool(self.path or self.remote_url)
+
+    @classmethod
+    def failed(cls, error: str = "FAILED", message: str | None = None) -> "DownloadResult":
+        return cls(error=error, error_message=message)
+
+    @classmethod
+    def from_ytdlp_info(cls, path: str, info: dict[str, Any] | None) -> "DownloadResult":
+        """Собирает результат из info-словаря yt-dlp (extract_info(..., download=True))."""
+        info = info or {}
+        return cls(
+            path=path,
+            width=_as_int(info.get("width")),
+            height=_as_int(info.get("height")),
+            duration=_as_float(info.get("duration")),
+            size=get_file_size(path),
+            mime_type="video/mp4",
+            format_id=info.get("format_id"),
+        )
+
+
+def _as_int(value: Any) -> int | None:
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_float(value: Any) -> float | None:
+    try:
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def get_file_size(path: str | None) -> int | None:
+    try:
+        return os.path.getsize(path) if path else None
+    except OSError:
+        return None
+
+
+def backoff_delay(attempt: int, base: float = DOWNLOAD_RETRY_BASE_DELAY, cap: float = DOWNLOAD_RETRY_MAX_DELAY) -> float:
+    """Экспоненциальная пауза с полным джиттером: случайно в [0, min(cap, base * 2^(attempt-1))]."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+async def retry_with_backoff(
+    attempt_fn: Callable[[int], Awaitable[tuple[str, T | None]]],
+    *,
+    max_attempts: int = DOWNLOAD_RETRY_ATTEMPTS,
+) -> tuple[str, T | None]:
+    """
+    Повторяет attempt_fn(attempt) -> (status, value). "OK" и коды из PERMANENT_ERRORS
+    возвращаются сразу, любой другой статус ("RETRY") повторяется. Пауза между попытками —
+    asyncio.sleep в event loop, поток пула в это время свободен.
+    После исчерпания попыток — ("FAILED", None).
+    """
+    for attempt in range(1, max_attempts + 1):
+        status, value = await attempt_fn(attempt)
+        if status == "OK" or status in PERMANENT_ERRORS:
+            return status, value
+        if attempt < max_attempts:
+            delay = backoff_delay(attempt)
+            logger.info("🔁 [RETRY] Попытка %s/%s не удалась, повтор через %.1fс", attempt, max_attempts, delay)
+            await asyncio.sleep(delay)
+    return "FAILED", None
 
 
 class BaseDownloader(ABC):
     @abstractmethod
-    async def download(self, url: str) -> str:
-        """Скачать видео по ссылке и вернуть путь к файлу."""
+    async def download(self, url: str) -> DownloadResult:
+        """Скачать видео по ссылке и вернуть DownloadResult."""
         pass
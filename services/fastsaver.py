@@ -1,14 +1,71 @@
 from __future__ import annotations
 
+import logging
 import os
+import time
 from typing import Any
 
 import aiofiles
 import aiohttp
 
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+    )
+}
+
+
+class CircuitBreaker:
+    """
+    Простой circuit breaker: после failure_threshold ошибок подряд вызовы пропускаются
+    reset_timeout секунд (open), затем пропускается одна пробная попытка (half-open).
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Снимает пробную попытку без результата (отмена): следующий вызов сможет попробовать снова."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
 
 class FastSaverClient:
-    """Client for FastSaverAPI fallback downloads."""
+    """Client for FastSaverAPI fallback downloads (one pooled session per process)."""
 
     def __init__(self) -> None:
         self.base_url = (os.getenv("FASTSAVER_BASE_URL") or "https://fastsaverapi.com").strip().rstrip("/")
@@ -20,28 +77,73 @@ class FastSaverClient:
             "yes",
             "on",
         }
+        self.stream_to_telegram = (os.getenv("FASTSAVER_STREAM_TO_TELEGRAM") or "1").strip().lower() in {
+            "1",
+            "true",
+            "yes",
+            "on",
+        }
+        # Потоком шлём только небольшие ролики с известным размером; остальное — через файл
+        self.stream_max_bytes = int((os.getenv("FASTSAVER_STREAM_MAX_BYTES") or str(20 * 1024 * 1024)).strip())
+        self.limit_per_host = int((os.getenv("FASTSAVER_POOL_LIMIT_PER_HOST") or "10").strip())
+        self.breaker = CircuitBreaker(
+            failure_threshold=int((os.getenv("FASTSAVER_BREAKER_FAILURES") or "3").strip()),
+            reset_timeout=float((os.getenv("FASTSAVER_BREAKER_RESET_SECONDS") or "60").strip()),
+        )
+        self._session: aiohttp.ClientSession | None = None
 
     @property
     def enabled(self) -> bool:
         return bool(self.token)
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        # keep-alive + DNS-кэш: повторный fallback не платит за DNS/TCP/TLS заново
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=30,
+                )
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     async def get_info(self, source_url: str) -> dict[str, Any] | None:
         if not self.enabled:
             return None
+        is_probe = self.breaker.state == "half-open"
+        if not self.breaker.allow():
+            logger.warning("⚠️ [FASTSAVER] Circuit breaker открыт, пропускаем запрос")
+            return None
 
         endpoint = f"{self.base_url}/get-info"
         timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
         params = {"url": source_url, "token": self.token}
 
         try:
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(endpoint, params=params) as response:
-                    if response.status != 200:
-                        return None
-                    payload = await response.json(content_type=None)
-        except Exception:
+            async with self._get_session().get(endpoint, params=params, timeout=timeout) as response:
+                if response.status >= 500:
+                    self.breaker.record_failure()
+                    return None
+                if response.status != 200:
+                    self.breaker.record_success()
+                    return None
+                payload = await response.json(content_type=None)
+        except Exception as e:
+            logger.warning("⚠️ [FASTSAVER] Ошибка запроса get-info: %s", e)
+            self.breaker.record_failure()
             return None
+        finally:
+            # Отменённая проба (CancelledError) не дошла ни до success, ни до failure
+            if is_probe:
+                self.breaker.release_probe()
 
+        self.breaker.record_success()
         if not isinstance(payload, dict) or payload.get("error"):
             return None
         return payload
@@ -70,25 +172,72 @@ class FastSaverClient:
                         return value
         return None
 
+    @staticmethod
+    def pick_media_meta(payload: dict[str, Any] | None) -> dict[str, Any]:
+        """
+        width/height/duration/size из ответа get-info (верхний уровень или первый
+        элемент medias/media). Отсутствующие поля — None.
+        """
+        meta: dict[str, Any] = {"width": None, "height": None, "duration": None, "size": None}
+        if not isinstance(payload, dict):
+            return meta
+
+        sources = [payload]
+        media_field = payload.get("medias") or payload.get("media")
+        if isinstance(media_field, dict):
+            sources.insert(0, media_field)
+        elif isinstance(media_field, list):
+            sources[:0] = [item for item in media_field[:1] if isinstance(item, dict)]
+
+        keys = {
+            "width": ("width",),
+            "height": ("height",),
+            "duration": ("duration",),
+            "size": ("size", "filesize", "file_size"),
+        }
+        for field, candidates in keys.items():
+            for source in sources:
+                value = next((source.get(key) for key in candidates if source.get(key)), None)
+                try:
+                    parsed = float(value) if field == "duration" else int(value)
+                except (TypeError, ValueError):
+                    continue
+                if parsed > 0:
+                    meta[field] = parsed
+                    break
+        return meta
+
+    def should_stream(self, meta: dict[str, Any]) -> bool:
+        """
+        Потоковая отправка только для небольших роликов (size <= stream_max_bytes) с известными
+        размерами кадра: без файла их не из чего пробовать, а без width/height вертикальное
+        видео в клиентах отображается неверно.
+        """
+        size = meta.get("size")
+        return (
+            self.stream_to_telegram
+            and size is not None
+            and size <= self.stream_max_bytes
+            and bool(meta.get("width") and meta.get("height"))
+        )
+
     async def download_to_file(self, media_url: str, output_path: str) -> bool:
         timeout = aiohttp.ClientTimeout(total=max(self.timeout_seconds, 60))
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
-            )
-        }
 
         try:
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.get(media_url, allow_redirects=True) as response:
-                    if response.status != 200:
-                        return False
-
-                    async with aiofiles.open(output_path, "wb") as out:
-                        async for chunk in response.content.iter_chunked(1024 * 256):
-                            if chunk:
-                                await out.write(chunk)
+            async with self._get_session().get(
+                media_url, allow_redirects=True, headers=DOWNLOAD_HEADERS, timeout=timeout
+            ) as response:
+                if response.status != 200:
+                    return False
+
+                async with aiofiles.open(output_path, "wb") as out:
+                    async for chunk in response.content.iter_chunked(1024 * 256):
+                        if chunk:
+                            await out.write(chunk)
             return True
         except Exception:
             return False
+
+
+fastsaver_client = FastSaverClient()
@@ -1,25 +1,24 @@
-from .base import BaseDownloader
+from .base import PERMANENT_ERRORS, BaseDownloader, DownloadResult, retry_with_backoff
 import os
 import uuid
-import asyncio
-import time
 import yt_dlp
-from config import DOWNLOAD_DIR
+from config import DOWNLOAD_DIR, DOWNLOAD_RETRY_ATTEMPTS
+from services.ytdlp_pool import ytdlp_pool
+from utils.executors import transfer_executor
 from utils.logger import get_logger, YTDlpLoggerAdapter
 
 logger = get_logger(__name__, platform="instagram")
 
 
 class InstagramDownloader(BaseDownloader):
-    async def download(self, url: str, message=None, user_id: int | None = None) -> str | None:
+    async def download(self, url: str, message=None, user_id: int | None = None) -> DownloadResult:
         """Загрузка видео с Instagram через yt-dlp.
 
-        Возвращает путь к файлу при успехе и None, если контент недоступен
-        (например, требуется авторизация/cookies или пост приватный).
+        Возвращает DownloadResult с путём к файлу при успехе и с кодом ошибки,
+        если контент недоступен (например, требуется авторизация/cookies или пост приватный).
         """
         filename = os.path.join(DOWNLOAD_DIR, f"{uuid.uuid4()}.mp4")
         logger.info("⬇️ [DOWNLOAD] Начало скачивания: url=%s", url)
-        loop = asyncio.get_running_loop()
 
         # Поддержка cookies / логина через переменные окружения
         cookies_path = (os.environ.get("COOKIES_PATH") or "").strip()
@@ -69,51 +68,44 @@ class InstagramDownloader(BaseDownloader):
                 return "LOGIN_REQUIRED"
             return "RETRY"
 
-        def run_download_with_retries():
-            max_attempts = 3
-            username = None
-            if hasattr(message, "from_user") and getattr(message.from_user, "username", None):
-                username = message.from_user.username
-            elif hasattr(message, "username"):
-                username = getattr(message, "username", None)
-            elif isinstance(message, int):
-                username = f"user_id={message}"
-            elif isinstance(user_id, int):
-                username = f"user_id={user_id}"
+        username = None
+        if hasattr(message, "from_user") and getattr(message.from_user, "username", None):
+            username = message.from_user.username
+        elif hasattr(message, "username"):
+            username = getattr(message, "username", None)
+        elif isinstance(message, int):
+            username = f"user_id={message}"
+        elif isinstance(user_id, int):
+            username = f"user_id={user_id}"
 
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        ydl.download([url])
-                    return "OK"
-                except yt_dlp.utils.DownloadError as e:  # noqa: PERF203
-                    err_str = str(e).lower()
-                    status = classify_download_error(err_str)
-                    if status == "AGE_RESTRICTED":
-                        logger.warning(
-                            "⚠️ [DOWNLOAD] Ограничение по возрасту (AGE_RESTRICTED): url=%s user=%s",
-                            url,
-                            username,
-                        )
-                        return status
-                    if status == "LOGIN_REQUIRED":
-                        logger.warning(
-                            "⚠️ [DOWNLOAD] Требуется логин/куки (LOGIN_REQUIRED): url=%s user=%s",
-                            url,
-                            username,
-                        )
-                        return status
-                    logger.error("❌ [DOWNLOAD] yt-dlp ошибка attempt=%s/%s err=%s", attempt, max_attempts, e)
-                except Exception:  # noqa: BLE001
-                    logger.exception("❌ [DOWNLOAD] Неожиданная ошибка attempt=%s/%s", attempt, max_attempts)
-                if attempt < max_attempts:
-                    time.sleep(5)
-            return "FAILED"
+        def run_attempt(attempt: int, max_attempts: int):
+            try:
+                with ytdlp_pool.acquire("instagram", ydl_opts, filename) as ydl:
+                    info = ydl.extract_info(url, download=True)
+                return "OK", info
+            except yt_dlp.utils.DownloadError as e:
+                err_str = str(e).lower()
+                status = classify_download_error(err_str)
+                if status in PERMANENT_ERRORS:
+                    reason = "Ограничение по возрасту" if status == "AGE_RESTRICTED" else "Требуется логин/куки"
+                    logger.warning(
+                        "⚠️ [DOWNLOAD] %s (%s): url=%s user=%s",
+                        reason,
+                        status,
+                        url,
+                        username,
+                    )
+                    return status, None
+                logger.error("❌ [DOWNLOAD] yt-dlp ошибка attempt=%s/%s err=%s", attempt, max_attempts, e)
+            except Exception:  # noqa: BLE001
+                logger.exception("❌ [DOWNLOAD] Неожиданная ошибка attempt=%s/%s", attempt, max_attempts)
+            return "RETRY", None
 
-        result = await loop.run_in_executor(None, run_download_with_retries)
-        if result != "OK":
-            logger.warning("⚠️ [DOWNLOAD] Скачивание не выполнено: status=%s url=%s", result, url)
-            # Возвращаем None в случае, если контент недоступен без авторизации
-            return None
+        status, info = await retry_with_backoff(
+            lambda attempt: transfer_executor.run(run_attempt, attempt, DOWNLOAD_RETRY_ATTEMPTS)
+        )
+        if status != "OK" or not os.path.exists(filename):
+            logger.warning("⚠️ [DOWNLOAD] Скачивание не выполнено: status=%s url=%s", status, url)
+            return DownloadResult.failed(status if status != "OK" else "FAILED")
         logger.info("✅ [DOWNLOAD] Скачивание завершено: файл=%s", filename)
-        return filename
+        return DownloadResult.from_ytdlp_info(filename, info)
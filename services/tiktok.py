@@ -1,12 +1,12 @@
-from .base import BaseDownloader
+from .base import PERMANENT_ERRORS, BaseDownloader, DownloadResult, retry_with_backoff
 import os
 import uuid
-import asyncio
-import time
 import yt_dlp
 from aiogram import types
-from config import DOWNLOAD_DIR
-from services.fastsaver import FastSaverClient
+from config import DOWNLOAD_DIR, DOWNLOAD_RETRY_ATTEMPTS
+from services.fastsaver import fastsaver_client
+from services.ytdlp_pool import ytdlp_pool
+from utils.executors import transfer_executor
 from utils.logger import get_logger, YTDlpLoggerAdapter
 
 logger = get_logger(__name__, platform="tiktok")
@@ -18,11 +18,10 @@ class TikTokDownloader(BaseDownloader):
         url: str,
         message: types.Message | None = None,
         user_id: int | None = None,
-    ) -> str | tuple[str, str] | None:
+    ) -> DownloadResult:
         """Скачивание видео с TikTok."""
         filename = os.path.join(DOWNLOAD_DIR, f"{uuid.uuid4()}.mp4")
         logger.info("⬇️ [DOWNLOAD] start url=%s", url)
-        loop = asyncio.get_running_loop()
         cookies_path = (os.environ.get("TIKTOK_COOKIES_PATH") or os.environ.get("COOKIES_PATH") or "").strip()
         proxy = (os.environ.get("TIKTOK_PROXY") or os.environ.get("YTDLP_PROXY") or "").strip()
 
@@ -65,52 +64,61 @@ class TikTokDownloader(BaseDownloader):
                 return "LOGIN_REQUIRED"
             return "RETRY"
 
-        def run_download_with_retries():
-            max_attempts = 3
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        ydl.download([url])
-                    return "OK"
-                except yt_dlp.utils.DownloadError as e:  # noqa: PERF203
-                    err_str = str(e).lower()
-                    status = classify_download_error(err_str)
-                    if status == "IP_BLOCKED":
-                        logger.warning("⚠️ [DOWNLOAD] TikTok блокирует IP сервера: url=%s", url)
-                        return status
-                    if status == "LOGIN_REQUIRED":
-                        logger.warning("⚠️ [DOWNLOAD] TikTok требует логин/cookies: url=%s", url)
-                        return status
-                    logger.error("yt-dlp error attempt=%s/%s err=%s", attempt, max_attempts, e)
-                except Exception:  # noqa: BLE001
-                    logger.exception("unexpected error attempt=%s/%s", attempt, max_attempts)
-                if attempt < max_attempts:
-                    time.sleep(5)
-            return "FAILED"
+        def run_attempt(attempt: int, max_attempts: int):
+            try:
+                with ytdlp_pool.acquire("tiktok", ydl_opts, filename) as ydl:
+                    info = ydl.extract_info(url, download=True)
+                return "OK", info
+            except yt_dlp.utils.DownloadError as e:
+                err_str = str(e).lower()
+                status = classify_download_error(err_str)
+                if status in PERMANENT_ERRORS:
+                    reason = "блокирует IP сервера" if status == "IP_BLOCKED" else "требует логин/cookies"
+                    logger.warning("⚠️ [DOWNLOAD] TikTok %s: url=%s", reason, url)
+                    return status, None
+                logger.error("yt-dlp error attempt=%s/%s err=%s", attempt, max_attempts, e)
+            except Exception:  # noqa: BLE001
+                logger.exception("unexpected error attempt=%s/%s", attempt, max_attempts)
+            return "RETRY", None
 
-        status = await loop.run_in_executor(None, run_download_with_retries)
+        status, info = await retry_with_backoff(
+            lambda attempt: transfer_executor.run(run_attempt, attempt, DOWNLOAD_RETRY_ATTEMPTS)
+        )
 
         # Fallback: один вызов FastSaver /get-info на один пользовательский запрос.
         if status != "OK":
-            fastsaver = FastSaverClient()
+            fastsaver = fastsaver_client
             if fastsaver.enabled and fastsaver.enabled_for_tiktok:
                 logger.info("🛟 [DOWNLOAD] yt-dlp failed (status=%s), пробуем FastSaver fallback", status)
                 info_payload = await fastsaver.get_info(url)
                 media_url = fastsaver.pick_download_url(info_payload)
+                meta = fastsaver.pick_media_meta(info_payload)
+                if media_url and fastsaver.should_stream(meta):
+                    # Небольшой ролик без записи на диск: send_video перельёт ответ FastSaver прямо в Bot API.
+                    # Размеры берём из get-info — пробовать нечего, файла нет
+                    logger.info("✅ [DOWNLOAD] FastSaver fallback: отправка потоком url=%s", url)
+                    return DownloadResult(
+                        remote_url=media_url,
+                        width=meta["width"],
+                        height=meta["height"],
+                        duration=meta["duration"],
+                        size=meta["size"],
+                        mime_type="video/mp4",
+                    )
                 if media_url:
                     downloaded = await fastsaver.download_to_file(media_url, filename)
                     if downloaded:
                         logger.info("✅ [DOWNLOAD] FastSaver fallback done file=%s", filename)
-                        return filename
+                        return DownloadResult.from_ytdlp_info(filename, None)
                 logger.warning("⚠️ [DOWNLOAD] FastSaver fallback не смог скачать url=%s", url)
 
         if status == "IP_BLOCKED":
-            return ("IP_BLOCKED", "TikTok заблокировал IP адрес сервера")
+            return DownloadResult.failed("IP_BLOCKED", "TikTok заблокировал IP адрес сервера")
         if status == "LOGIN_REQUIRED":
-            return ("LOGIN_REQUIRED", "TikTok требует cookies/авторизацию")
-        if status != "OK":
+            return DownloadResult.failed("LOGIN_REQUIRED", "TikTok требует cookies/авторизацию")
+        if status != "OK" or not os.path.exists(filename):
             logger.error("download failed after retries url=%s", url)
-            return None
+            return DownloadResult.failed()
 
         logger.info("✅ [DOWNLOAD] done file=%s", filename)
-        return filename
+        return DownloadResult.from_ytdlp_info(filename, info)
@@ -3,23 +3,501 @@
 Исправление: ранее процент "застревал" (например, на ~33%), потому что учитывался
 только текущий файл (video или audio). Теперь прогресс агрегирует размеры всех
 скачиваемых частей (video + audio) и отображает суммарный процент.
+
+Для non-progressive форматов видео- и аудиопоток качаются одновременно, а крупные
+потоки дополнительно режутся на диапазоны (&range=start-end), которые тянутся
+параллельно несколькими воркерами и пишутся в файл по смещению.
+
+С YOUTUBE_STREAM_MUX=1 video/audio не сохраняются на диск: тела потоков подаются
+в ffmpeg через FIFO и сразу собираются в итоговый фрагментированный MP4.
 """
 
 from __future__ import annotations
 
+import errno
 import os
 import uuid
+import shutil
 import asyncio
+import tempfile
+import threading
+from collections import deque
+from contextlib import suppress
+
+import aiohttp
 from pytubefix import YouTube
-import re 
+from pytubefix.exceptions import RegexMatchError
+from pytubefix.extract import video_id as extract_video_id
+import re
 
+from utils.executors import disk_io_executor, metadata_executor, transfer_executor
 from utils.logger import get_logger
-from .base import BaseDownloader
-from config import DOWNLOAD_DIR
+from utils.ttl_cache import TTLCache
+from .base import BaseDownloader, DownloadResult, get_file_size
+from config import (
+    DOWNLOAD_DIR,
+    YOUTUBE_RANGE_CHUNK_BYTES,
+    YOUTUBE_RANGE_SPLIT_MIN_BYTES,
+    YOUTUBE_OBJECT_CACHE_SIZE,
+    YOUTUBE_OBJECT_CACHE_TTL_SECONDS,
+    YOUTUBE_RANGE_WORKERS,
+    YOUTUBE_STREAM_MUX,
+)
 
 
 logger = get_logger(__name__, platform="youtube")
 
+RANGE_REQUEST_HEADERS = {"User-Agent": "Mozilla/5.0", "accept-language": "en-US,en"}
+RANGE_REQUEST_RETRIES = 3
+RANGE_READ_CHUNK_BYTES = 1024 * 1024
+PROGRESS_INTERVAL_SECONDS = 3
+FIFO_OPEN_POLL_SECONDS = 0.05
+
+
+def _build_result(
+    yt: YouTube,
+    path: str,
+    video_stream,
+    audio_stream=None,
+    mime_type: str = "video/mp4",
+) -> DownloadResult:
+    """DownloadResult из метаданных pytubefix: размеры берём у выбранного видеопотока."""
+    format_id = str(video_stream.itag)
+    if audio_stream is not None and audio_stream is not video_stream:
+        format_id = f"{video_stream.itag}+{audio_stream.itag}"
+    return DownloadResult(
+        path=path,
+        width=getattr(video_stream, "width", None) or None,
+        height=getattr(video_stream, "height", None) or None,
+        duration=float(getattr(yt, "length", 0) or 0) or None,
+        size=get_file_size(path),
+        mime_type=mime_type,
+        format_id=format_id,
+    )
+
+
+# Разобранные объекты YouTube (watch page, player JS, расшифрованный манифест потоков)
+# живут недолго и общие для меню качества и последующего скачивания.
+_youtube_objects = TTLCache(maxsize=YOUTUBE_OBJECT_CACHE_SIZE, ttl=YOUTUBE_OBJECT_CACHE_TTL_SECONDS)
+
+
+def get_youtube_video_id(url: str) -> str | None:
+    """11-символьный id видео из ссылки YouTube (watch, youtu.be, shorts, embed) или None."""
+    try:
+        return extract_video_id(url)
+    except RegexMatchError:
+        return None
+
+
+def _youtube_key(url: str) -> str:
+    return get_youtube_video_id(url) or url.strip()
+
+
+def _get_youtube(url: str) -> YouTube:
+    """
+    YouTube из кэша по video id либо новый с уже загруженным манифестом потоков.
+    Блокирующий вызов: выполнять в metadata_executor.
+    """
+    key = _youtube_key(url)
+    yt = _youtube_objects.get(key)
+    if yt is None:
+        yt = YouTube(url)
+        yt.streams  # noqa: B018 - загружаем и расшифровываем манифест до сохранения в кэш
+        _youtube_objects.set(key, yt)
+    return yt
+
+
+def _forget_youtube(url: str) -> None:
+    """Сбрасывает закэшированный объект (например, ссылки потоков протухли и загрузка упала)."""
+    _youtube_objects.pop(_youtube_key(url))
+
+
+def _best_audio_stream(yt: YouTube):
+    return yt.streams.filter(only_audio=True, file_extension='mp4').order_by('abr').desc().first()
+
+
+class _AggregateProgress:
+    """
+    Суммарный прогресс всех скачиваемых частей (video + audio).
+    Байты добавляются из любых потоков; раз в PROGRESS_INTERVAL_SECONDS процент
+    пишется в лог и, если передан message, в отдельное статусное сообщение.
+    """
+
+    def __init__(self, message=None) -> None:
+        self.total = 0
+        self.done = 0
+        self._lock = threading.Lock()
+        self._message = message if hasattr(message, "answer") else None
+        self._status_message = None
+        self._last_percent = -1
+        self._task: asyncio.Task | None = None
+
+    def add_total(self, size: int) -> None:
+        with self._lock:
+            self.total += max(0, int(size or 0))
+
+    def advance(self, size: int) -> None:
+        with self._lock:
+            self.done += size
+
+    def reset(self) -> None:
+        with self._lock:
+            self.total = 0
+            self.done = 0
+
+    @property
+    def percent(self) -> int:
+        if not self.total:
+            return 0
+        return max(0, min(100, int(self.done * 100 / self.total)))
+
+    async def __aenter__(self) -> "_AggregateProgress":
+        self._task = asyncio.create_task(self._report_loop())
+        return self
+
+    async def __aexit__(self, *_exc) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+        if self._status_message is not None:
+            with suppress(Exception):
+                await self._status_message.delete()
+
+    async def _report_loop(self) -> None:
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL_SECONDS)
+            percent = self.percent
+            if percent == self._last_percent:
+                continue
+            self._last_percent = percent
+            logger.info(
+                "⏬ [PROGRESS] %s%% (%.1f/%.1f MB)",
+                percent,
+                self.done / 1024 / 1024,
+                self.total / 1024 / 1024,
+            )
+            if self._message is None:
+                continue
+            text = f"⏬ Скачивание: {percent}%"
+            try:
+                if self._status_message is None:
+                    self._status_message = await self._message.answer(text)
+                else:
+                    await self._status_message.edit_text(text)
+            except Exception as e:
+                logger.debug("Не удалось обновить сообщение прогресса: %s", e)
+
+
+async def _fetch_range(
+    session: aiohttp.ClientSession,
+    url: str,
+    fd: int,
+    start: int,
+    end: int,
+    progress: _AggregateProgress,
+) -> None:
+    """Скачивает байты [start, end] и пишет их в fd по смещению start (с ретраями)."""
+    for attempt in range(1, RANGE_REQUEST_RETRIES + 1):
+        written = 0
+        try:
+            async with session.get(f"{url}&range={start}-{end}") as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(RANGE_READ_CHUNK_BYTES):
+                    await disk_io_executor.run(os.pwrite, fd, chunk, start + written)
+                    written += len(chunk)
+                    progress.advance(len(chunk))
+            if written != end - start + 1:
+                raise aiohttp.ClientPayloadError(f"short range read {written}/{end - start + 1}")
+            return
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            progress.advance(-written)
+            if attempt == RANGE_REQUEST_RETRIES:
+                raise
+            await asyncio.sleep(attempt)
+
+
+def _preallocate(path: str, size: int) -> int:
+    """Создаёт файл нужного размера под параллельную запись диапазонов и возвращает fd на запись."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size)
+    except OSError:
+        os.close(fd)
+        raise
+    return fd
+
+
+async def _fetch_ranged(
+    session: aiohttp.ClientSession,
+    url: str,
+    path: str,
+    size: int,
+    progress: _AggregateProgress,
+) -> None:
+    """Параллельно тянет поток диапазонами по YOUTUBE_RANGE_CHUNK_BYTES в заранее выделенный файл."""
+    ranges = deque(
+        (start, min(start + YOUTUBE_RANGE_CHUNK_BYTES, size) - 1)
+        for start in range(0, size, YOUTUBE_RANGE_CHUNK_BYTES)
+    )
+    fd = await disk_io_executor.run(_preallocate, path, size)
+    try:
+        async def worker() -> None:
+            while ranges:
+                start, end = ranges.popleft()
+                await _fetch_range(session, url, fd, start, end, progress)
+
+        async with asyncio.TaskGroup() as group:
+            for _ in range(min(YOUTUBE_RANGE_WORKERS, len(ranges))):
+                group.create_task(worker())
+    finally:
+        await disk_io_executor.run(os.close, fd)
+
+
+async def _stream_size(stream) -> int:
+    """Размер потока в байтах (stream.filesize может делать HEAD-запрос); 0 — неизвестен."""
+    with suppress(Exception):
+        return int(await metadata_executor.run(lambda: stream.filesize) or 0)
+    return 0
+
+
+async def _fetch_stream(
+    session: aiohttp.ClientSession,
+    stream,
+    path: str,
+    progress: _AggregateProgress,
+) -> None:
+    """
+    Скачивает один поток pytubefix в path. Крупные (не SABR) потоки — диапазонами
+    параллельно; мелкие, SABR или при сбое ranged-загрузки — штатным stream.download.
+    """
+    size = await _stream_size(stream)
+    progress.add_total(size)
+
+    if size >= YOUTUBE_RANGE_SPLIT_MIN_BYTES and not getattr(stream, "is_sabr", False):
+        before = progress.done
+        try:
+            await _fetch_ranged(session, stream.url, path, size, progress)
+            return
+        except Exception as e:
+            logger.warning("⚠️ [DOWNLOAD] Ranged-загрузка itag=%s не удалась, fallback: %s", stream.itag, e)
+            progress.advance(before - progress.done)
+
+    def run_download():
+        stream.download(output_path=os.path.dirname(path), filename=os.path.basename(path), skip_existing=False)
+
+    await transfer_executor.run(run_download)
+    progress.advance(size)
+
+
+async def _mux(video_path: str, audio_path: str, filename: str) -> None:
+    """Mux video+audio через ffmpeg без перекодирования."""
+    cmd = [
+        "ffmpeg", "-y",
+        "-i", video_path,
+        "-i", audio_path,
+        "-c:v", "copy",
+        "-c:a", "copy",
+        filename
+    ]
+    logger.info("🎛️ [MUX] ffmpeg объединение начинается")
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    _stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        logger.error(f"❌ [MUX] Ошибка ffmpeg mux: {stderr.decode()}")
+        raise Exception(f"ffmpeg mux error: {stderr.decode()}")
+
+
+def _can_stream_mux(*streams) -> bool:
+    # SABR-потоки отдаются только через stream.download, FIFO нужен POSIX
+    return hasattr(os, "mkfifo") and not any(getattr(s, "is_sabr", False) for s in streams)
+
+
+async def _iter_stream_chunks(session: aiohttp.ClientSession, url: str, size: int):
+    """
+    Последовательно отдаёт байты потока диапазонами по YOUTUBE_RANGE_CHUNK_BYTES.
+    При обрыве докачивает с последнего отданного байта, а не с начала диапазона.
+    """
+    for start in range(0, size, YOUTUBE_RANGE_CHUNK_BYTES):
+        end = min(start + YOUTUBE_RANGE_CHUNK_BYTES, size) - 1
+        pos = start
+        attempt = 0
+        while pos <= end:
+            try:
+                async with session.get(f"{url}&range={pos}-{end}") as response:
+                    response.raise_for_status()
+                    async for chunk in response.content.iter_chunked(RANGE_READ_CHUNK_BYTES):
+                        pos += len(chunk)
+                        yield chunk
+                if pos <= end:
+                    raise aiohttp.ClientPayloadError(f"short range read {pos - start}/{end - start + 1}")
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                attempt += 1
+                if attempt >= RANGE_REQUEST_RETRIES:
+                    raise
+                await asyncio.sleep(attempt)
+
+
+async def _pipe_stream(
+    session: aiohttp.ClientSession,
+    url: str,
+    size: int,
+    fifo_path: str,
+    progress: _AggregateProgress,
+) -> None:
+    """
+    Пишет тело потока в FIFO, который читает ffmpeg. Запись неблокирующая, в event loop:
+    пока ffmpeg читает другой вход, этот канал просто ждёт готовности, не занимая поток.
+    """
+    fd = await _open_fifo_writer(fifo_path)
+    try:
+        async for chunk in _iter_stream_chunks(session, url, size):
+            await _write_fifo(fd, chunk)
+            progress.advance(len(chunk))
+    finally:
+        with suppress(OSError):
+            os.close(fd)
+
+
+async def _write_fifo(fd: int, data: bytes) -> None:
+    """Пишет data в неблокирующий fd целиком, дожидаясь готовности канала через loop.add_writer."""
+    loop = asyncio.get_running_loop()
+    view = memoryview(data)
+    while view:
+        try:
+            view = view[os.write(fd, view):]
+        except BlockingIOError:
+            ready = loop.create_future()
+            loop.add_writer(fd, lambda: ready.done() or ready.set_result(None))
+            try:
+                await ready
+            finally:
+                loop.remove_writer(fd)
+
+
+async def _open_fifo_writer(fifo_path: str):
+    """
+    Открывает FIFO на запись без блокировки: open() даёт ENXIO, пока ffmpeg не открыл
+    канал, — ждём в event loop и пробуем снова. Возвращает неблокирующий fd.
+    """
+    while True:
+        try:
+            fd = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            if e.errno != errno.ENXIO:
+                raise
+            await asyncio.sleep(FIFO_OPEN_POLL_SECONDS)
+            continue
+        return fd
+
+
+async def _stream_mux(
+    session: aiohttp.ClientSession,
+    video_stream,
+    audio_stream,
+    filename: str,
+    progress: _AggregateProgress,
+) -> bool:
+    """
+    Mux на лету: тела video/audio потоков идут в ffmpeg через именованные каналы,
+    результат — фрагментированный MP4. Промежуточные файлы на диск не пишутся.
+    False — режим неприменим или не удался (частичный результат удалён), нужен обычный mux.
+    """
+    video_size, audio_size = await asyncio.gather(_stream_size(video_stream), _stream_size(audio_stream))
+    if not video_size or not audio_size:
+        return False
+    progress.add_total(video_size + audio_size)
+
+    fifo_dir = tempfile.mkdtemp(prefix="mux_", dir=DOWNLOAD_DIR)
+    video_fifo = os.path.join(fifo_dir, "video")
+    audio_fifo = os.path.join(fifo_dir, "audio")
+    os.mkfifo(video_fifo)
+    os.mkfifo(audio_fifo)
+    cmd = [
+        "ffmpeg", "-y",
+        "-i", video_fifo,
+        "-i", audio_fifo,
+        "-map", "0:v:0",
+        "-map", "1:a:0",
+        "-c", "copy",
+        "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+        filename
+    ]
+    logger.info("🎛️ [MUX] Потоковое объединение через ffmpeg начинается")
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+
+    async def wait_ffmpeg() -> None:
+        _stdout, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise Exception(f"ffmpeg stream mux error: {stderr.decode(errors='replace')[-2000:]}")
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(_pipe_stream(session, video_stream.url, video_size, video_fifo, progress))
+            group.create_task(_pipe_stream(session, audio_stream.url, audio_size, audio_fifo, progress))
+            group.create_task(wait_ffmpeg())
+        return True
+    except Exception as e:
+        errors = e.exceptions if isinstance(e, BaseExceptionGroup) else (e,)
+        logger.warning("⚠️ [MUX] Потоковый mux не удался, fallback на файлы: %s", "; ".join(map(str, errors)))
+        with suppress(OSError):
+            await disk_io_executor.run(os.remove, filename)
+        progress.reset()
+        return False
+    finally:
+        if proc.returncode is None:
+            with suppress(ProcessLookupError):
+                proc.kill()
+            await proc.wait()
+        await disk_io_executor.run(shutil.rmtree, fifo_dir, True)
+
+
+async def _download_single(yt: YouTube, stream, filename: str, message=None) -> DownloadResult:
+    """Скачивание одного потока (progressive видео или аудио) с прогрессом."""
+    try:
+        async with aiohttp.ClientSession(headers=RANGE_REQUEST_HEADERS) as session:
+            async with _AggregateProgress(message) as progress:
+                await _fetch_stream(session, stream, filename, progress)
+    except Exception as e:
+        logger.error("❌ [DOWNLOAD] Ошибка при скачивании itag=%s: %s", stream.itag, str(e))
+        return DownloadResult.failed(message=str(e))
+    if not os.path.exists(filename):
+        return DownloadResult.failed()
+    mime_type = "audio/mp4" if filename.endswith(".m4a") else "video/mp4"
+    return _build_result(yt, filename, stream, mime_type=mime_type)
+
+
+async def _download_adaptive(yt: YouTube, video_stream, audio_stream, filename: str, message=None) -> DownloadResult:
+    """
+    Одновременно качает video-only и audio потоки и объединяет их в filename.
+    При YOUTUBE_STREAM_MUX потоки сразу идут в ffmpeg без временных файлов.
+    """
+    video_path = os.path.join(DOWNLOAD_DIR, f"{uuid.uuid4()}_video.mp4")
+    audio_path = os.path.join(DOWNLOAD_DIR, f"{uuid.uuid4()}_audio.m4a")
+    try:
+        async with aiohttp.ClientSession(headers=RANGE_REQUEST_HEADERS) as session:
+            async with _AggregateProgress(message) as progress:
+                streamed = (
+                    YOUTUBE_STREAM_MUX
+                    and _can_stream_mux(video_stream, audio_stream)
+                    and await _stream_mux(session, video_stream, audio_stream, filename, progress)
+                )
+                if not streamed:
+                    async with asyncio.TaskGroup() as group:
+                        group.create_task(_fetch_stream(session, video_stream, video_path, progress))
+                        group.create_task(_fetch_stream(session, audio_stream, audio_path, progress))
+        if not streamed:
+            await _mux(video_path, audio_path, filename)
+    finally:
+        # Удаляем временные файлы
+        for path in (video_path, audio_path):
+            with suppress(Exception):
+                await disk_io_executor.run(os.remove, path)
+    if not os.path.exists(filename):
+        return DownloadResult.failed()
+    return _build_result(yt, filename, video_stream, audio_stream)
+
+
 class YTDLPDownloader(BaseDownloader):
     async def download_by_itag(
         self,
@@ -27,81 +505,44 @@ class YTDLPDownloader(BaseDownloader):
         itag: int,
         message,
         user_id: int | None = None,
-    ) -> str | tuple[str, str] | None:
+    ) -> DownloadResult:
         logger.info("⬇️ [DOWNLOAD] Начало скачивания по itag=%s, url=%s", itag, url)
         """
         Скачивание видео по конкретному itag (mux если нужно).
         """
         filename = os.path.join(DOWNLOAD_DIR, f"{uuid.uuid4()}.mp4")
-        loop = asyncio.get_running_loop()
-        yt = YouTube(url)
-        stream = yt.streams.get_by_itag(itag)
+
+        def pick_streams():
+            yt = _get_youtube(url)
+            stream = yt.streams.get_by_itag(itag)
+            if not stream or stream.is_progressive:
+                return yt, stream, None
+            return yt, stream, _best_audio_stream(yt)
+
+        yt, stream, audio_stream = await metadata_executor.run(pick_streams)
         if not stream:
             raise Exception(f"No stream found for itag={itag}")
         # Если progressive — просто скачиваем
         if stream.is_progressive:
-            def run_download():
-                stream.download(output_path=DOWNLOAD_DIR, filename=os.path.basename(filename))
-            try:
-                await loop.run_in_executor(None, run_download)
-            except Exception as e:
-                logger.error("❌ [DOWNLOAD] Ошибка при скачивании видео по тегу: %s", str(e))
-                return None
-            if not os.path.exists(filename):
-                return None
-            logger.info("✅ [DOWNLOAD] Скачивание успешно: файл=%s", filename)
-            return filename
-        # Если не progressive — mux video+audio
+            result = await _download_single(yt, stream, filename, message)
+        # Если не progressive — параллельно качаем video+audio и mux
         else:
-            # Скачиваем видео
-            video_path = os.path.join(DOWNLOAD_DIR, f"{uuid.uuid4()}_video.mp4")
-            def run_download_video():
-                stream.download(output_path=DOWNLOAD_DIR, filename=os.path.basename(video_path))
-            await loop.run_in_executor(None, run_download_video)
-            # Скачиваем лучший аудиопоток
-            audio_stream = yt.streams.filter(only_audio=True, file_extension='mp4').order_by('abr').desc().first()
             if not audio_stream:
                 raise Exception("No audio/mp4 stream found for mux")
-            audio_path = os.path.join(DOWNLOAD_DIR, f"{uuid.uuid4()}_audio.m4a")
-            def run_download_audio():
-                audio_stream.download(output_path=DOWNLOAD_DIR, filename=os.path.basename(audio_path))
-            await loop.run_in_executor(None, run_download_audio)
-            # Mux video+audio через ffmpeg
-            import subprocess
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", video_path,
-                "-i", audio_path,
-                "-c:v", "copy",
-                "-c:a", "copy",
-                filename
-            ]
-
-            logger.info(f"🎛️ [MUX] ffmpeg объединение начинается")
-            proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-            _stdout, stderr = await proc.communicate()
-            if proc.returncode != 0:
-                logger.error(f"❌ [MUX] Ошибка ffmpeg mux: {stderr.decode()}")
-                raise Exception(f"ffmpeg mux error: {stderr.decode()}")
-            # Удаляем временные файлы
-            try:
-                await asyncio.to_thread(os.remove, video_path)
-                await asyncio.to_thread(os.remove, audio_path)
-            except Exception:
-                pass
-            if not os.path.exists(filename):
-                return None
+            result = await _download_adaptive(yt, stream, audio_stream, filename, message)
+        if result.ok:
             logger.info("✅ [DOWNLOAD] Скачивание успешно: файл=%s", filename)
-            return filename
+        else:
+            _forget_youtube(url)
+        return result
 
     async def get_available_video_options(self, url: str) -> dict:
         """
         Возвращает title, thumbnail_url, duration_seconds и список форматов mp4.
         Каждый формат: {'itag', 'res', 'progressive', 'filesize', 'mime_type'}
         """
-        loop = asyncio.get_running_loop()
         def fetch():
-            yt = YouTube(url)
+            yt = _get_youtube(url)
             title = yt.title
             thumbnail_url = yt.thumbnail_url
             duration_seconds = int(getattr(yt, "length", 0) or 0)
@@ -131,44 +572,28 @@ class YTDLPDownloader(BaseDownloader):
                 'duration_seconds': duration_seconds,
                 'formats': formats
             }
-        return await loop.run_in_executor(None, fetch)
-    
+        return await metadata_executor.run(fetch)
+
 
-    async def download(self, url: str, message, user_id: int | None = None) -> str | tuple[str, str]:
+    async def download(self, url: str, message, user_id: int | None = None) -> DownloadResult:
         logger.info("⬇️ [DOWNLOAD] Начало скачивания лучшего mp4, url=%s", url)
         """
         Скачивание лучшего mp4 (progressive, со звуком) через pytubefix.
         """
         filename = os.path.join(DOWNLOAD_DIR, f"{uuid.uuid4()}.mp4")
-        loop = asyncio.get_running_loop()
 
-        yt = YouTube(url)
-
-        # Лучший mp4 progressive (со звуком) с приоритетом 360p/480p
-        stream = None
-        for res in ["480p", "360p"]:
-            stream = yt.streams.filter(progressive=True, file_extension='mp4', resolution=res).first()
-            if stream:
-                break
-        if not stream:
+        def pick_streams():
+            yt = _get_youtube(url)
+            # Лучший mp4 progressive (со звуком) с приоритетом 360p/480p
+            stream = None
+            for res in ["480p", "360p"]:
+                stream = yt.streams.filter(progressive=True, file_extension='mp4', resolution=res).first()
+                if stream:
+                    return yt, stream, None
             # Если нет 360p/480p, берём любой progressive mp4
             stream = yt.streams.filter(progressive=True, file_extension='mp4').order_by('resolution').desc().first()
-
-        if stream:
-            def run_download():
-                stream.download(output_path=DOWNLOAD_DIR, filename=os.path.basename(filename))
-
-            try:
-                await loop.run_in_executor(None, run_download)
-            except Exception as e:
-                err = str(e)
-                logger.error("❌ [DOWNLOAD] Ошибка при скачивании: %s", err)
-                return None
-            if not os.path.exists(filename):
-                return None
-            logger.info("✅ [DOWNLOAD] Готово: файл=%s", filename)
-            return filename
-        else:
+            if stream:
+                return yt, stream, None
             # Нет progressive mp4 — fallback: ищем лучший video/mp4 и audio/mp4, объединяем
             video_stream = None
             for res in ["480p", "360p", "720p"]:
@@ -177,67 +602,52 @@ class YTDLPDownloader(BaseDownloader):
                     break
             if not video_stream:
                 video_stream = yt.streams.filter(progressive=False, file_extension='mp4', type='video').order_by('resolution').desc().first()
+            return yt, video_stream, _best_audio_stream(yt)
 
-            audio_stream = yt.streams.filter(only_audio=True, file_extension='mp4').order_by('abr').desc().first()
-            if not video_stream or not audio_stream:
-                raise Exception("No suitable video/audio mp4 streams found for mux")
-            video_path = os.path.join(DOWNLOAD_DIR, f"{uuid.uuid4()}_video.mp4")
-            audio_path = os.path.join(DOWNLOAD_DIR, f"{uuid.uuid4()}_audio.m4a")
-            def run_download_video():
-                video_stream.download(output_path=DOWNLOAD_DIR, filename=os.path.basename(video_path))
-            def run_download_audio():
-                audio_stream.download(output_path=DOWNLOAD_DIR, filename=os.path.basename(audio_path))
-            await loop.run_in_executor(None, run_download_video)
-            await loop.run_in_executor(None, run_download_audio)
-            # Mux video+audio через ffmpeg
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", video_path,
-                "-i", audio_path,
-                "-c:v", "copy",
-                "-c:a", "copy",
-                filename
-            ]
-            proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-            _stdout, stderr = await proc.communicate()
-            if proc.returncode != 0:
-                logger.error(f"❌ [MUX] Ошибка ffmpeg mux: {stderr.decode()}")
-                raise Exception(f"ffmpeg mux error: {stderr.decode()}")
-            # Удаляем временные файлы
-            try:
-                os.remove(video_path)
-                os.remove(audio_path)
-            except Exception:
-                pass
-            if not os.path.exists(filename):
-                return None
+        yt, stream, audio_stream = await metadata_executor.run(pick_streams)
+        if stream and audio_stream is None:
+            result = await _download_single(yt, stream, filename, message)
+            if result.ok:
+                logger.info("✅ [DOWNLOAD] Готово: файл=%s", filename)
+            else:
+                _forget_youtube(url)
+            return result
+
+        if not stream or not audio_stream:
+            raise Exception("No suitable video/audio mp4 streams found for mux")
+        result = await _download_adaptive(yt, stream, audio_stream, filename, message)
+        if result.ok:
             logger.info("✅ [MUX] MUX завершён: файл=%s", filename)
-            return filename
+        else:
+            _forget_youtube(url)
+        return result
 
-    async def download_audio(self, url: str) -> str | None:
+    async def download_audio(self, url: str) -> DownloadResult:
         logger.info("⬇️ [AUDIO] Начало скачивания аудио, url=%s", url)
         """
         Скачивает лучший аудиопоток (m4a/mp4) через pytubefix, без конвертации в mp3.
         Имя файла — как название видео на YouTube (безопасно для файловой системы).
         """
-        yt = YouTube(url)
-        safe_title = re.sub(r'[^\w\d\-_ ]', '', yt.title).strip()
+        def pick_stream():
+            yt = _get_youtube(url)
+            return yt, yt.title, _best_audio_stream(yt)
+
+        try:
+            yt, title, stream = await metadata_executor.run(pick_stream)
+        except Exception as e:
+            logger.error("❌ [AUDIO] Ошибка при получении аудиопотока: %s", str(e))
+            return DownloadResult.failed(message=str(e))
+        if not stream:
+            logger.error("❌ [AUDIO] Ошибка при скачивании аудио: No audio/mp4 stream found")
+            return DownloadResult.failed(message="No audio/mp4 stream found")
+
+        safe_title = re.sub(r'[^\w\d\-_ ]', '', title).strip()
         if not safe_title:
             safe_title = str(uuid.uuid4())
         filename = os.path.join(DOWNLOAD_DIR, f"{safe_title}.m4a")
-        loop = asyncio.get_running_loop()
-        def run_download():
-            stream = yt.streams.filter(only_audio=True, file_extension='mp4').order_by('abr').desc().first()
-            if not stream:
-                raise Exception("No audio/mp4 stream found")
-            stream.download(output_path=DOWNLOAD_DIR, filename=os.path.basename(filename))
-        try:
-            await loop.run_in_executor(None, run_download)
-        except Exception as e:
-            logger.error("❌ [AUDIO] Ошибка при скачивании аудио: %s", str(e))
-            return None
-        if not os.path.exists(filename):
-            return None
-        logger.info("✅ [AUDIO] Готово: файл=%s", filename)
-        return filename
-    
+        result = await _download_single(yt, stream, filename)
+        if result.ok:
+            logger.info("✅ [AUDIO] Готово: файл=%s", filename)
+        else:
+            _forget_youtube(url)
+        return result
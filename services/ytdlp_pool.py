@@ -0,0 +1,107 @@
+"""Пул прогретых yt_dlp.YoutubeDL по профилям (платформа + набор опций).
+
+Создание YoutubeDL заново на каждую попытку инициализирует экстракторы, читает
+cookie-файл и собирает HTTP-opener. Пул выдаёт готовый экземпляр одному потоку
+за раз (thread-confined), подменяет outtmpl под конкретный запрос и возвращает
+экземпляр обратно. После YTDLP_POOL_MAX_USES загрузок или после любой ошибки
+экземпляр закрывается и заменяется новым.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+import yt_dlp
+
+from config import YTDLP_POOL_MAX_IDLE, YTDLP_POOL_MAX_USES
+
+logger = logging.getLogger(__name__)
+
+# Опции, которые не влияют на профиль: outtmpl подменяется на каждый запрос
+_PER_REQUEST_OPTIONS = {"outtmpl", "logger"}
+
+
+@dataclass(slots=True)
+class _PooledYDL:
+    ydl: yt_dlp.YoutubeDL
+    uses: int = 0
+
+
+def _profile_key(profile: str, opts: dict[str, Any]) -> tuple[str, str]:
+    fingerprint = repr(sorted((k, repr(v)) for k, v in opts.items() if k not in _PER_REQUEST_OPTIONS))
+    return profile, fingerprint
+
+
+class YoutubeDLPool:
+    def __init__(self, max_idle_per_profile: int, max_uses: int) -> None:
+        self.max_idle_per_profile = max_idle_per_profile
+        self.max_uses = max(1, max_uses)
+        self._idle: dict[tuple[str, str], list[_PooledYDL]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _close(self, entry: _PooledYDL) -> None:
+        try:
+            entry.ydl.close()  # в том числе сохраняет cookie jar
+        except Exception:
+            logger.debug("Ошибка при закрытии YoutubeDL", exc_info=True)
+
+    @contextmanager
+    def acquire(self, profile: str, opts: dict[str, Any], outtmpl: str) -> Iterator[yt_dlp.YoutubeDL]:
+        """
+        Выдаёт YoutubeDL профиля с outtmpl текущего запроса. Блокирующий вызов:
+        использовать внутри потока пула (transfer_executor), не в event loop.
+        """
+        key = _profile_key(profile, opts)
+        with self._lock:
+            entry = self._idle[key].pop() if self._idle[key] else None
+        if entry is None:
+            entry = _PooledYDL(yt_dlp.YoutubeDL({**opts, "outtmpl": outtmpl}))
+            with self._lock:
+                self.created += 1
+        else:
+            with self._lock:
+                self.reused += 1
+        # После __init__ yt-dlp хранит outtmpl словарём шаблонов по типам
+        entry.ydl.params["outtmpl"]["default"] = outtmpl
+        if "logger" in opts:
+            entry.ydl.params["logger"] = opts["logger"]
+
+        healthy = False
+        try:
+            yield entry.ydl
+            healthy = True
+        finally:
+            entry.uses += 1
+            keep = healthy and entry.uses < self.max_uses
+            if keep:
+                with self._lock:
+                    keep = len(self._idle[key]) < self.max_idle_per_profile
+                    if keep:
+                        self._idle[key].append(entry)
+            if not keep:
+                self._close(entry)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "idle": sum(len(entries) for entries in self._idle.values()),
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+    def close_all(self) -> None:
+        with self._lock:
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+        for entry in entries:
+            self._close(entry)
+
+
+ytdlp_pool = YoutubeDLPool(YTDLP_POOL_MAX_IDLE, YTDLP_POOL_MAX_USES)
@@ -0,0 +1,35 @@
+"""Профиль бота (get_me), закэшированный на весь процесс.
+
+Заполняется при старте в bot.py; подписи к медиа и хендлеры берут username/id
+отсюда, не делая лишний запрос к Bot API на каждое сообщение.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.types import User
+
+logger = logging.getLogger(__name__)
+
+_profile: User | None = None
+_lock = asyncio.Lock()
+
+
+async def get_bot_profile(bot: Bot, *, refresh: bool = False) -> User:
+    """Возвращает закэшированный профиль бота; refresh=True перечитывает его из Bot API."""
+    global _profile
+    if _profile is not None and not refresh:
+        return _profile
+    async with _lock:
+        if _profile is None or refresh:
+            _profile = await bot.get_me()
+            logger.info("🤖 [BOT] Профиль бота загружен: @%s (id=%s)", _profile.username, _profile.id)
+    return _profile
+
+
+async def get_bot_username(bot: Bot) -> str:
+    profile = await get_bot_profile(bot)
+    return profile.username or ""
@@ -0,0 +1,206 @@
+"""Движок массовой рассылки: пул воркеров + token bucket под лимиты Telegram.
+
+Bot API пропускает около 30 сообщений в секунду на бота и 1 сообщение в секунду
+в один чат. Рассылка пишет каждому пользователю один раз, поэтому ограничивать
+нужно общий поток — это делает TokenBucket. Воркеры параллельно ждут ответы
+Telegram, так что скорость упирается в лимит, а не в задержку сети.
+
+- TelegramRetryAfter: весь bucket встаёт на паузу retry_after, сообщение повторяется.
+- TelegramForbiddenError: пользователь заблокировал бота — помечаем bot_blocked_at
+  (пачками), следующие рассылки его пропускают.
+- Прогресс с текущей скоростью (msg/s) отдаётся колбэку раз в progress_interval.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable
+
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+
+from db.base import get_session
+from db.users import mark_users_blocked
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_FLUSH_BATCH = 100
+
+
+class TokenBucket:
+    """rate токенов в секунду, не больше capacity подряд; pause() останавливает выдачу для всех."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        # После паузы стартуем без накопленного запаса, чтобы не получить новый RetryAfter
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    self._updated = time.monotonic()
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass(slots=True)
+class BroadcastStats:
+    total: int
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    retried: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    _window_started: float = field(default_factory=time.monotonic)
+    _window_sent: int = 0
+    current_rate: float = 0.0
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def average_rate(self) -> float:
+        elapsed = self.elapsed
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def roll_window(self) -> None:
+        """Скорость за последнее окно отчёта (msg/s)."""
+        now = time.monotonic()
+        span = now - self._window_started
+        if span > 0:
+            self.current_rate = (self.sent - self._window_sent) / span
+        self._window_started, self._window_sent = now, self.sent
+
+
+class BroadcastEngine:
+    def __init__(
+        self,
+        send: Callable[[int], Awaitable[object]],
+        *,
+        rate: float,
+        burst: float,
+        workers: int,
+        max_retries: int,
+    ) -> None:
+        self.send = send
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self._blocked: list[int] = []
+
+    async def _flush_blocked(self) -> None:
+        if not self._blocked:
+            return
+        user_ids, self._blocked = self._blocked, []
+        try:
+            async with get_session() as session:
+                await mark_users_blocked(session, user_ids)
+                await session.commit()
+        except Exception as e:
+            logger.error("🚫 [BROADCAST] Не удалось пометить %s заблокировавших: %s", len(user_ids), e)
+
+    async def _deliver(self, user_id: int, stats: BroadcastStats) -> None:
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                await self.send(user_id)
+                stats.sent += 1
+                return
+            except TelegramRetryAfter as e:
+                logger.warning("⏸️ [BROADCAST] RetryAfter %sс, пауза всей рассылки", e.retry_after)
+                self.bucket.pause(e.retry_after)
+                stats.retried += 1
+            except TelegramForbiddenError:
+                stats.blocked += 1
+                self._blocked.append(user_id)
+                if len(self._blocked) >= BLOCKED_FLUSH_BATCH:
+                    await self._flush_blocked()
+                return
+            except TelegramAPIError as e:
+                logger.info("🚫 [BROADCAST] TelegramAPIError для %s: %s", user_id, e)
+                stats.failed += 1
+                return
+            except Exception as e:
+                logger.error("🚫 [BROADCAST] Неизвестная ошибка при отправке пользователю %s: %s", user_id, e, exc_info=True)
+                stats.failed += 1
+                return
+        stats.failed += 1
+
+    async def _worker(self, queue: asyncio.Queue, stats: BroadcastStats) -> None:
+        while True:
+            user_id = await queue.get()
+            try:
+                if user_id is None:
+                    return
+                await self._deliver(user_id, stats)
+            finally:
+                queue.task_done()
+
+    async def _report(
+        self,
+        stats: BroadcastStats,
+        on_progress: Callable[[BroadcastStats], Awaitable[None]],
+        interval: float,
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            stats.roll_window()
+            logger.info(
+                "📢 [BROADCAST] %s/%s, %.1f msg/s (в среднем %.1f)",
+                stats.processed, stats.total, stats.current_rate, stats.average_rate,
+            )
+            try:
+                await on_progress(stats)
+            except Exception as e:
+                logger.debug("Ошибка отчёта о прогрессе рассылки: %s", e)
+
+    async def run(
+        self,
+        user_ids: AsyncIterator[int],
+        *,
+        total: int,
+        on_progress: Callable[[BroadcastStats], Awaitable[None]],
+        progress_interval: float,
+    ) -> BroadcastStats:
+        """Отправляет всем из user_ids; очередь ограничена, id читаются по мере отправки."""
+        stats = BroadcastStats(total=total)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 4)
+        workers = [asyncio.create_task(self._worker(queue, stats)) for _ in range(self.workers)]
+        reporter = asyncio.create_task(self._report(stats, on_progress, progress_interval))
+        try:
+            async for user_id in user_ids:
+                await queue.put(user_id)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            reporter.cancel()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(reporter, *workers, return_exceptions=True)
+            await self._flush_blocked()
+        stats.roll_window()
+        return stats
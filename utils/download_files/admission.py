@@ -0,0 +1,241 @@
+"""Контроль допуска загрузок: общий лимит, лимиты по платформам и приоритеты.
+
+Загрузка (yt-dlp/pytubefix, mux, выгрузка в Telegram) стартует только при
+свободном слоте — и общем, и своей платформы. Остальные ждут в общей очереди.
+Ожидающие, чья платформа сейчас занята, не задерживают остальных.
+
+Порядок допуска — stride scheduling по классам приоритета (token_x > token > free):
+класс с весом w получает примерно w/sum(w) освободившихся слотов, поэтому платные
+загрузки идут первыми, но бесплатные тоже продвигаются. Внутри класса — по времени
+постановки в очередь плюс ограниченный штраф за длительность видео: короткие
+обгоняют длинные, но не больше чем на DOWNLOAD_DURATION_PENALTY_MAX_SECONDS.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from config import (
+    DOWNLOAD_DURATION_PENALTY_MAX_SECONDS,
+    DOWNLOAD_DURATION_PENALTY_RATIO,
+    DOWNLOAD_MAX_CONCURRENT,
+    DOWNLOAD_PLATFORM_LIMITS,
+    DOWNLOAD_PRIORITY_WEIGHTS,
+)
+
+logger = logging.getLogger(__name__)
+
+QueueNotifier = Callable[[int], Awaitable[None]]
+
+QUEUE_POSITION_POLL_SECONDS = 5
+DEFAULT_PRIORITY = "free"
+_STRIDE = 1.0
+_WAIT_SAMPLES = 512
+
+
+@dataclass(eq=False)
+class _Waiter:
+    platform: str
+    future: asyncio.Future
+    priority: str = DEFAULT_PRIORITY
+    duration: float = 0.0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def sort_key(self) -> float:
+        penalty = min(self.duration * DOWNLOAD_DURATION_PENALTY_RATIO, DOWNLOAD_DURATION_PENALTY_MAX_SECONDS)
+        return self.enqueued_at + max(0.0, penalty)
+
+
+class AdmissionController:
+    """Семафор с общим и поплатформенными лимитами и приоритетной очередью ожидания."""
+
+    def __init__(
+        self,
+        global_limit: int,
+        platform_limits: dict[str, int],
+        priority_weights: dict[str, int] | None = None,
+    ) -> None:
+        self.global_limit = global_limit
+        self.platform_limits = platform_limits
+        self.priority_weights = priority_weights or {DEFAULT_PRIORITY: 1}
+        self._active: dict[str, int] = {}
+        self._queue: list[_Waiter] = []
+        # stride scheduling: "пройденный путь" класса и виртуальное время планировщика
+        self._pass: dict[str, float] = {}
+        self._vtime = 0.0
+        self._admitted = 0
+        self._max_wait = 0.0
+        self._waits: deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self._class_waits: dict[str, deque[float]] = {}
+
+    @property
+    def active(self) -> int:
+        return sum(self._active.values())
+
+    def _weight(self, priority: str) -> int:
+        return max(1, int(self.priority_weights.get(priority, 1)))
+
+    def _has_room(self, platform: str) -> bool:
+        if self.active >= self.global_limit:
+            return False
+        limit = self.platform_limits.get(platform)
+        return limit is None or self._active.get(platform, 0) < limit
+
+    def _admit(self, waiter: _Waiter, waited: float) -> None:
+        self._active[waiter.platform] = self._active.get(waiter.platform, 0) + 1
+        self._admitted += 1
+        self._waits.append(waited)
+        self._class_waits.setdefault(waiter.priority, deque(maxlen=_WAIT_SAMPLES)).append(waited)
+        self._max_wait = max(self._max_wait, waited)
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        if not any(w.priority == waiter.priority for w in self._queue):
+            # Простаивавший класс не копит "кредит": стартует с текущего виртуального времени
+            self._pass[waiter.priority] = max(self._pass.get(waiter.priority, 0.0), self._vtime)
+        self._queue.append(waiter)
+
+    def _pick(self) -> _Waiter | None:
+        eligible = [w for w in self._queue if not w.future.done() and self._has_room(w.platform)]
+        if not eligible:
+            return None
+        priority = min(
+            {w.priority for w in eligible},
+            key=lambda p: (self._pass.get(p, 0.0), -self._weight(p)),
+        )
+        return min((w for w in eligible if w.priority == priority), key=lambda w: w.sort_key)
+
+    def _dispatch(self) -> None:
+        """Допускает ожидающих, пока есть свободные слоты, в порядке stride scheduling."""
+        now = time.monotonic()
+        while self.active < self.global_limit:
+            waiter = self._pick()
+            if waiter is None:
+                return
+            self._queue.remove(waiter)
+            self._vtime = self._pass.get(waiter.priority, 0.0)
+            self._pass[waiter.priority] = self._vtime + _STRIDE / self._weight(waiter.priority)
+            self._admit(waiter, now - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def position(self, waiter: _Waiter) -> int:
+        """Примерная позиция: ожидающие более весомых классов и те, кто раньше в своём классе."""
+        if waiter not in self._queue:
+            return 0
+        weight = self._weight(waiter.priority)
+        ahead = sum(
+            1
+            for w in self._queue
+            if w is not waiter
+            and (
+                self._weight(w.priority) > weight
+                or (w.priority == waiter.priority and w.sort_key < waiter.sort_key)
+            )
+        )
+        return ahead + 1
+
+    async def acquire(
+        self,
+        platform: str,
+        on_queued: QueueNotifier | None = None,
+        *,
+        priority: str = DEFAULT_PRIORITY,
+        duration: float = 0.0,
+    ) -> None:
+        """
+        Ждёт свободный слот для platform. priority — класс (token_x/token/free),
+        duration — длительность видео в секундах, если известна.
+        on_queued(position) вызывается при постановке в очередь и при изменении позиции.
+        """
+        waiter = _Waiter(platform, asyncio.get_running_loop().create_future(), priority, float(duration or 0))
+        self._enqueue(waiter)
+        self._dispatch()
+        if waiter.future.done():
+            return
+        logger.info(
+            "⏳ [QUEUE] Загрузка %s (%s) в очереди, позиция %s", platform, priority, self.position(waiter)
+        )
+        reported = 0
+        try:
+            while True:
+                position = self.position(waiter)
+                if on_queued is not None and position and position != reported:
+                    reported = position
+                    try:
+                        await on_queued(position)
+                    except Exception as e:
+                        logger.debug("Не удалось сообщить позицию в очереди: %s", e)
+                if waiter.future.done():
+                    return
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), QUEUE_POSITION_POLL_SECONDS)
+                    return
+                except asyncio.TimeoutError:
+                    continue
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Слот уже выдан, но ожидающий отменён — возвращаем его
+                self.release(platform)
+            else:
+                waiter.future.cancel()
+                if waiter in self._queue:
+                    self._queue.remove(waiter)
+                self._dispatch()
+            raise
+
+    def release(self, platform: str) -> None:
+        self._active[platform] = max(0, self._active.get(platform, 0) - 1)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        platform: str,
+        on_queued: QueueNotifier | None = None,
+        *,
+        priority: str = DEFAULT_PRIORITY,
+        duration: float = 0.0,
+    ) -> AsyncIterator[None]:
+        await self.acquire(platform, on_queued, priority=priority, duration=duration)
+        try:
+            yield
+        finally:
+            self.release(platform)
+
+    def stats(self) -> dict[str, Any]:
+        waits = sorted(self._waits)
+        queued: dict[str, int] = {}
+        queued_by_priority: dict[str, int] = {}
+        for waiter in self._queue:
+            queued[waiter.platform] = queued.get(waiter.platform, 0) + 1
+            queued_by_priority[waiter.priority] = queued_by_priority.get(waiter.priority, 0) + 1
+        wait_p95_by_priority = {}
+        for priority, samples in self._class_waits.items():
+            ordered = sorted(samples)
+            wait_p95_by_priority[priority] = ordered[int(len(ordered) * 0.95)] if ordered else 0.0
+        return {
+            "active": self.active,
+            "limit": self.global_limit,
+            "active_by_platform": dict(self._active),
+            "queued": len(self._queue),
+            "queued_by_platform": queued,
+            "queued_by_priority": queued_by_priority,
+            "admitted": self._admitted,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "wait_max": self._max_wait,
+            "wait_p95_by_priority": wait_p95_by_priority,
+        }
+
+
+download_admission = AdmissionController(
+    DOWNLOAD_MAX_CONCURRENT,
+    DOWNLOAD_PLATFORM_LIMITS,
+    DOWNLOAD_PRIORITY_WEIGHTS,
+)
@@ -1,3 +1,47 @@
+"""Нормализация ссылок: одна каноническая форма на одно видео.
+
+youtu.be/X, youtube.com/watch?v=X&si=..., m.youtube.com, /shorts/X — это одно и то же
+видео, и кэш file_id, single-flight и история должны видеть один ключ.
+canonicalize_url работает без сети; resolve_canonical_url дополнительно
+раскрывает короткие ссылки TikTok (vt./vm.tiktok.com) через ShortLinkResolver.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass
+from urllib.parse import parse_qs, urlsplit
+
+import aiohttp
+from yarl import URL
+
+from config import SHORT_LINK_CACHE_SIZE, SHORT_LINK_CACHE_TTL_SECONDS
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SHORT_LINK_TIMEOUT_SECONDS = 10
+SHORT_LINK_MAX_REDIRECTS = 5
+SHORT_LINK_POOL_SIZE = 20
+SHORT_LINK_HEADERS = {"User-Agent": "Mozilla/5.0", "accept-language": "en-US,en"}
+
+_YOUTUBE_HOSTS = {"youtube.com", "m.youtube.com", "music.youtube.com", "youtube-nocookie.com"}
+_YOUTUBE_ID = re.compile(r"^[0-9A-Za-z_-]{11}$")
+_YOUTUBE_PATH_ID = re.compile(r"^/(?:shorts|embed|live|v)/([0-9A-Za-z_-]{11})")
+_TIKTOK_POST_ID = re.compile(r"/(video|photo|v)/(\d{8,})")
+_TIKTOK_SHORT_HOSTS = {"vt.tiktok.com", "vm.tiktok.com"}
+_INSTAGRAM_SHORTCODE = re.compile(r"^/(?:[\w.]+/)?(?:p|reels?|tv)/([\w-]+)")
+
+
+@dataclass(slots=True, frozen=True)
+class CanonicalUrl:
+    """platform — youtube/tiktok/instagram/unknown; content_id — None, если id не извлечён."""
+    platform: str
+    content_id: str | None
+    url: str
+
+
 def strip_url_after_ampersand(url: str) -> str:
     """
     Возвращает url без аргументов после первого & (оставляет только до первого &).
@@ -5,4 +49,127 @@ def strip_url_after_ampersand(url: str) -> str:
     """
     if '&' in url:
         return url.split('&', 1)[0]
-    return url
\ No newline at end of file
+    return url
+
+
+def _host(parts) -> str:
+    host = (parts.hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _host_matches(host: str, domain: str) -> bool:
+    """host — сам domain или его поддомен (vm.tiktok.com да, nottiktok.com нет)."""
+    return host == domain or host.endswith(f".{domain}")
+
+
+def _youtube_id(parts, host: str) -> str | None:
+    if host == "youtu.be":
+        candidate = parts.path.strip("/").split("/", 1)[0]
+        return candidate if _YOUTUBE_ID.match(candidate) else None
+    if host not in _YOUTUBE_HOSTS:
+        return None
+    if parts.path in {"/watch", "/watch/"}:
+        candidate = (parse_qs(parts.query).get("v") or [""])[0]
+        return candidate if _YOUTUBE_ID.match(candidate) else None
+    match = _YOUTUBE_PATH_ID.match(parts.path)
+    return match.group(1) if match else None
+
+
+def canonicalize_url(url: str) -> CanonicalUrl:
+    """Каноническая ссылка без сетевых запросов. Неизвестные ссылки — как раньше, обрезка после &."""
+    raw = (url or "").strip()
+    parts = urlsplit(raw if "://" in raw else f"https://{raw}")
+    host = _host(parts)
+
+    video_id = _youtube_id(parts, host)
+    if video_id:
+        return CanonicalUrl("youtube", video_id, f"https://www.youtube.com/watch?v={video_id}")
+
+    if _host_matches(host, "tiktok.com"):
+        match = _TIKTOK_POST_ID.search(parts.path)
+        if match:
+            # Фото-посты остаются /photo/: это другой контент и другой ключ кэша
+            kind = "photo" if match.group(1) == "photo" else "video"
+            aweme_id = match.group(2)
+            return CanonicalUrl("tiktok", aweme_id, f"https://www.tiktok.com/@/{kind}/{aweme_id}")
+        return CanonicalUrl("tiktok", None, strip_url_after_ampersand(raw))
+
+    if _host_matches(host, "instagram.com"):
+        match = _INSTAGRAM_SHORTCODE.match(parts.path)
+        if match:
+            shortcode = match.group(1)
+            return CanonicalUrl("instagram", shortcode, f"https://www.instagram.com/p/{shortcode}/")
+        return CanonicalUrl("instagram", None, strip_url_after_ampersand(raw))
+
+    platform = "youtube" if host in _YOUTUBE_HOSTS or host == "youtu.be" else "unknown"
+    return CanonicalUrl(platform, None, strip_url_after_ampersand(raw))
+
+
+def is_tiktok_short_link(url: str) -> bool:
+    raw = (url or "").strip()
+    return _host(urlsplit(raw if "://" in raw else f"https://{raw}")) in _TIKTOK_SHORT_HOSTS
+
+
+class ShortLinkResolver:
+    """
+    Раскрывает короткие ссылки (vt./vm.tiktok.com) по заголовку Location без загрузки
+    страниц. Одна пулированная aiohttp-сессия на процесс и TTL-кэш "короткая → каноническая".
+    """
+
+    def __init__(self, cache_size: int, cache_ttl: float) -> None:
+        self._cache = TTLCache(cache_size, cache_ttl)
+        self._session: aiohttp.ClientSession | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=SHORT_LINK_TIMEOUT_SECONDS),
+                headers=SHORT_LINK_HEADERS,
+                connector=aiohttp.TCPConnector(limit=SHORT_LINK_POOL_SIZE, ttl_dns_cache=300),
+            )
+        return self._session
+
+    async def resolve(self, url: str) -> CanonicalUrl | None:
+        """Каноническая ссылка для короткой или None, если раскрыть не удалось."""
+        key = url.strip()
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        session = self._get_session()
+        current = key
+        for _ in range(SHORT_LINK_MAX_REDIRECTS):
+            async with session.get(current, allow_redirects=False) as response:
+                location = response.headers.get("Location")
+            if not location:
+                return None
+            current = str(URL(current).join(URL(location)))
+            resolved = canonicalize_url(current)
+            if resolved.content_id:
+                self._cache.set(key, resolved)
+                return resolved
+        return None
+
+    def stats(self) -> dict[str, int]:
+        return self._cache.stats()
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+short_link_resolver = ShortLinkResolver(SHORT_LINK_CACHE_SIZE, SHORT_LINK_CACHE_TTL_SECONDS)
+
+
+async def resolve_canonical_url(url: str) -> CanonicalUrl:
+    """canonicalize_url + раскрытие коротких ссылок TikTok; при ошибке сети — без раскрытия."""
+    canonical = canonicalize_url(url)
+    if canonical.content_id or not is_tiktok_short_link(url):
+        return canonical
+    try:
+        resolved = await short_link_resolver.resolve(canonical.url)
+    except (aiohttp.ClientError, TimeoutError) as e:
+        logger.warning("⚠️ [URL] Не удалось раскрыть короткую ссылку %s: %s", url, e)
+        return canonical
+    return resolved or canonical
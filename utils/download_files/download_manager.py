@@ -1,25 +1,24 @@
 import logging
+from contextlib import suppress
+from typing import Awaitable, Callable
 
 from aiogram import Bot, types
 from aiogram.fsm.context import FSMContext
 
 from services import get_downloader
 from services.youtube import YTDLPDownloader
-from utils.download_files.send import send_audio, send_video
-from utils.download_files.video_utils import get_video_resolution
-from utils.token_policy import get_youtube_price
+from utils.download_files.admission import download_admission
+from utils.download_files.send import build_audio_caption, build_video_caption, send_audio, send_video
+from utils.download_files.single_flight import SingleFlight
+from utils.stats_writer import download_stats_writer
+from utils.token_policy import get_download_priority, get_youtube_price
 from db.base import get_session
 from db.channels import (
     check_user_memberships,
     get_required_active_channels,
     is_channel_guard_enabled,
 )
-from db.downloads import (
-    add_download_link,
-    get_or_create_total_download,
-    increment_daily_download,
-)
-from db.platforms import increment_platform_download
+from db.downloads import flush_download_counters, record_download
 from db.media_cache import (
     delete_cached_media,
     get_cached_file_id,
@@ -27,13 +26,12 @@ from db.media_cache import (
 )
 from db.tokens import (
     get_daily_social_usage,
-    increment_daily_social_usage,
     refund_token_x,
     refund_tokens,
     spend_token_x,
     spend_tokens,
+    today_utc,
 )
-from db.users import add_or_update_user, log_user_activity
 from config import ADMINS, SOCIAL_DAILY_LIMIT
 
 logger = logging.getLogger(__name__)
@@ -41,6 +39,9 @@ BUSY_KEY = "busy"
 GENERIC_DOWNLOAD_ERROR_TEXT = "❗️Произошла ошибка. Попробуйте позже."
 CACHED_SEND_TIMEOUT_SECONDS = 600
 
+# Одновременные запросы одной и той же ссылки скачиваются один раз
+download_flights = SingleFlight()
+
 
 async def is_busy(state: FSMContext) -> bool:
     data = await state.get_data()
@@ -51,6 +52,54 @@ async def set_busy(state: FSMContext, value: bool):
     await state.update_data({BUSY_KEY: value})
 
 
+def _flight_key(url: str, media_type: str, quality: str) -> tuple[str, str, str]:
+    return (url or "").strip(), media_type, quality
+
+
+class _QueueNotice:
+    """Сообщение пользователю о его позиции в очереди загрузок."""
+
+    def __init__(self, message: types.Message) -> None:
+        self.message = message
+        self.sent: types.Message | None = None
+
+    async def update(self, position: int) -> None:
+        text = f"⏳ Сейчас много загрузок. Ваша позиция в очереди: {position}"
+        if self.sent is None:
+            self.sent = await self.message.answer(text)
+        else:
+            await self.sent.edit_text(text)
+
+    async def clear(self) -> None:
+        if self.sent is not None:
+            with suppress(Exception):
+                await self.sent.delete()
+            self.sent = None
+
+
+async def _run_admitted(
+    message: types.Message,
+    platform: str,
+    produce: Callable[[], Awaitable[tuple[bool, str | None]]],
+    *,
+    currency: str | None = None,
+    duration_seconds: int = 0,
+) -> tuple[bool, str | None]:
+    """Запускает загрузку, когда admission-контроллер выдаст слот (с учётом приоритета оплаты)."""
+    notice = _QueueNotice(message)
+    try:
+        async with download_admission.slot(
+            platform,
+            notice.update,
+            priority=get_download_priority(currency),
+            duration=duration_seconds,
+        ):
+            await notice.clear()
+            return await produce()
+    finally:
+        await notice.clear()
+
+
 async def _send_error(message: types.Message, admin_text: str) -> None:
     user_id = getattr(getattr(message, "from_user", None), "id", None)
     if user_id in ADMINS:
@@ -128,22 +177,23 @@ async def _log_download(
     platform: str,
     source_url: str,
 ) -> None:
+    deferred = download_stats_writer.running
     async with get_session() as session:
-        await add_or_update_user(
+        await record_download(
             session,
             user_id,
-            getattr(message.from_user, "first_name", None),
-            getattr(message.from_user, "username", None),
+            platform,
+            source_url,
+            first_name=getattr(message.from_user, "first_name", None),
+            username=getattr(message.from_user, "username", None),
+            counters=not deferred,
         )
-        await log_user_activity(session, user_id)
-        await increment_daily_download(session, user_id)
-        total_row = await get_or_create_total_download(session, user_id)
-        total_row.total += 1
-        await add_download_link(session, user_id, source_url)
-        await increment_platform_download(session, user_id, platform)
-        if platform in {"tiktok", "instagram"}:
-            await increment_daily_social_usage(session, user_id)
         await session.commit()
+    # Счётчики пишутся фоном после коммита: строка users к этому моменту уже есть
+    if deferred and not download_stats_writer.enqueue(user_id, platform):
+        async with get_session() as session:
+            await flush_download_counters(session, {(user_id, today_utc(), platform): 1})
+            await session.commit()
 
 
 async def _send_cached_media(
@@ -153,19 +203,18 @@ async def _send_cached_media(
     media_type: str,
 ) -> bool:
     try:
-        me = await message.bot.get_me()
         if media_type == "audio":
             await message.bot.send_audio(
                 chat_id=message.chat.id,
                 audio=file_id,
-                caption=f"🎵 Скачивай аудио с Tiktok | Instagram | YouTube \n\n@{me.username}",
+                caption=await build_audio_caption(message.bot),
                 request_timeout=CACHED_SEND_TIMEOUT_SECONDS,
             )
         else:
             await message.bot.send_video(
                 chat_id=message.chat.id,
                 video=file_id,
-                caption=f"🎬 Скачивай видео с Tiktok | Instagram | YouTube \n\n@{me.username}",
+                caption=await build_video_caption(message.bot),
                 supports_streaming=True,
                 request_timeout=CACHED_SEND_TIMEOUT_SECONDS,
             )
@@ -235,65 +284,65 @@ async def process_youtube_or_other(
                     )
                     await session.commit()
 
-            downloader = YTDLPDownloader()
-            file_path: str | None = None
-
-            try:
-                if quality == "audio":
-                    file_path = await downloader.download_audio(url)
-                    if not file_path:
-                        await _refund_youtube(user_id, currency, amount)
-                        return await _send_error(message, "❗️Не удалось скачать аудио.")
-                    sent_ok, sent_file_id = await send_audio(message.bot, message, message.chat.id, file_path)
-                    if not sent_ok:
-                        await _refund_youtube(user_id, currency, amount)
-                        return
-                    if sent_file_id:
-                        async with get_session() as session:
-                            await upsert_cached_media(
-                                session,
-                                url=url,
-                                media_type="audio",
-                                quality=cache_quality,
-                                file_id=sent_file_id,
-                                created_by_user_id=user_id,
-                            )
-                            await session.commit()
-                else:
-                    itag = option.get("itag")
-                    if not isinstance(itag, int):
-                        await _refund_youtube(user_id, currency, amount)
-                        return await _send_error(message, "❗️Формат недоступен для скачивания.")
-
-                    result = await downloader.download_by_itag(url, itag, message, user_id)
-                    if not result or isinstance(result, tuple):
-                        await _refund_youtube(user_id, currency, amount)
-                        return await _send_error(message, "❗️Не удалось скачать видео.")
-
-                    file_path = result
-                    w, h = get_video_resolution(file_path)
-                    sent_ok, sent_file_id = await send_video(
-                        message.bot, message, message.chat.id, user_id, file_path, w, h
-                    )
-                    if not sent_ok:
-                        await _refund_youtube(user_id, currency, amount)
-                        return
-                    if sent_file_id:
-                        async with get_session() as session:
-                            await upsert_cached_media(
-                                session,
-                                url=url,
-                                media_type="video",
-                                quality=cache_quality,
-                                file_id=sent_file_id,
-                                created_by_user_id=user_id,
-                            )
-                            await session.commit()
-            except Exception:
-                await _refund_youtube(user_id, currency, amount)
-                raise
-
-            await _log_download(message, user_id, platform, url)
+            async def produce_youtube() -> tuple[bool, str | None]:
+                downloader = YTDLPDownloader()
+                try:
+                    if quality == "audio":
+                        result = await downloader.download_audio(url)
+                        if not result.ok:
+                            await _refund_youtube(user_id, currency, amount)
+                            await _send_error(message, "❗️Не удалось скачать аудио.")
+                            return False, None
+                        sent_ok, sent_file_id = await send_audio(message.bot, message, message.chat.id, result)
+                    else:
+                        itag = option.get("itag")
+                        if not isinstance(itag, int):
+                            await _refund_youtube(user_id, currency, amount)
+                            await _send_error(message, "❗️Формат недоступен для скачивания.")
+                            return False, None
+
+                        result = await downloader.download_by_itag(url, itag, message, user_id)
+                        if not result.ok:
+                            await _refund_youtube(user_id, currency, amount)
+                            await _send_error(message, "❗️Не удалось скачать видео.")
+                            return False, None
+
+                        sent_ok, sent_file_id = await send_video(
+                            message.bot, message, message.chat.id, user_id, result
+                        )
+                except Exception:
+                    await _refund_youtube(user_id, currency, amount)
+                    raise
+
+                if not sent_ok:
+                    await _refund_youtube(user_id, currency, amount)
+                    return False, None
+                if sent_file_id:
+                    async with get_session() as session:
+                        await upsert_cached_media(
+                            session,
+                            url=url,
+                            media_type=media_type,
+                            quality=cache_quality,
+                            file_id=sent_file_id,
+                            created_by_user_id=user_id,
+                        )
+                        await session.commit()
+                return True, sent_file_id
+
+            sent_ok, _ = await download_flights.run(
+                _flight_key(url, media_type, cache_quality),
+                lambda: _run_admitted(
+                    message,
+                    platform,
+                    produce_youtube,
+                    currency=currency,
+                    duration_seconds=duration_seconds,
+                ),
+                lambda file_id: _send_cached_media(message, file_id=file_id, media_type=media_type),
+            )
+            if sent_ok:
+                await _log_download(message, user_id, platform, url)
             return
 
         async with get_session() as session:
@@ -323,45 +372,51 @@ async def process_youtube_or_other(
             logger.warning("[DOWNLOAD] unsupported platform for url: %s", url)
             return await message.answer("❗️Эта платформа пока не поддерживается.")
 
-        result = await downloader.download(url, message=message, user_id=user_id)
-        if result is None:
-            logger.warning("[DOWNLOAD] downloader returned None for non-youtube: %s", url)
-            if platform == "instagram":
-                return await _send_error(
-                    message,
-                    "❗️Instagram не отдал медиа без авторизации. "
-                    "Пост может быть приватным или требовать cookies.",
-                )
-            return await _send_error(message, "❗️Не удалось скачать: контент недоступен или нужен логин.")
+        async def produce_other() -> tuple[bool, str | None]:
+            result = await downloader.download(url, message=message, user_id=user_id)
+            if not result.ok:
+                logger.warning("[DOWNLOAD] download failed for non-youtube: error=%s url=%s", result.error, url)
+                if platform == "tiktok" and result.error == "IP_BLOCKED":
+                    await _send_error(
+                        message,
+                        "❗️TikTok блокирует IP сервера для этого видео. "
+                        "Нужен прокси/VPN для контейнера app.",
+                    )
+                elif platform == "tiktok" and result.error == "LOGIN_REQUIRED":
+                    await _send_error(message, "❗️TikTok требует cookies/авторизацию для этого видео.")
+                elif platform == "instagram":
+                    await _send_error(
+                        message,
+                        "❗️Instagram не отдал медиа без авторизации. "
+                        "Пост может быть приватным или требовать cookies.",
+                    )
+                else:
+                    await _send_error(message, "❗️Не удалось скачать: контент недоступен или нужен логин.")
+                return False, None
 
-        if isinstance(result, tuple):
-            if platform == "tiktok" and result[0] == "IP_BLOCKED":
-                return await _send_error(
-                    message,
-                    "❗️TikTok блокирует IP сервера для этого видео. "
-                    "Нужен прокси/VPN для контейнера app.",
-                )
-            if platform == "tiktok" and result[0] == "LOGIN_REQUIRED":
-                return await _send_error(message, "❗️TikTok требует cookies/авторизацию для этого видео.")
-            return await _send_error(message, f"❗️Ошибка при скачивании: {result}")
-
-        file_path = result
-        w, h = get_video_resolution(file_path)
-        sent_ok, sent_file_id = await send_video(message.bot, message, message.chat.id, user_id, file_path, w, h)
-        if not sent_ok:
-            return
-        if sent_file_id:
-            async with get_session() as session:
-                await upsert_cached_media(
-                    session,
-                    url=url,
-                    media_type="video",
-                    quality="default",
-                    file_id=sent_file_id,
-                    created_by_user_id=user_id,
-                )
-                await session.commit()
-        await _log_download(message, user_id, platform, url)
+            sent_ok, sent_file_id = await send_video(message.bot, message, message.chat.id, user_id, result)
+            if not sent_ok:
+                return False, None
+            if sent_file_id:
+                async with get_session() as session:
+                    await upsert_cached_media(
+                        session,
+                        url=url,
+                        media_type="video",
+                        quality="default",
+                        file_id=sent_file_id,
+                        created_by_user_id=user_id,
+                    )
+                    await session.commit()
+            return True, sent_file_id
+
+        sent_ok, _ = await download_flights.run(
+            _flight_key(url, "video", "default"),
+            lambda: _run_admitted(message, platform, produce_other),
+            lambda file_id: _send_cached_media(message, file_id=file_id, media_type="video"),
+        )
+        if sent_ok:
+            await _log_download(message, user_id, platform, url)
 
     except Exception as e:
         logger.error("❌ [DOWNLOAD] Ошибка при скачивании: %s", e, exc_info=True)
@@ -2,8 +2,12 @@ import os
 import asyncio
 import logging
 from aiogram import Bot, types
-from aiogram.types import FSInputFile
+from aiogram.types import FSInputFile, URLInputFile
+from services.base import DownloadResult
+from services.fastsaver import DOWNLOAD_HEADERS
+from utils.bot_profile import get_bot_username
 from .file_cleanup import remove_file_later
+from .video_utils import probe_video
 
 
 logger = logging.getLogger(__name__)
@@ -11,29 +15,97 @@ UPLOAD_REQUEST_TIMEOUT_SECONDS = 600
 USE_LOCAL_FILE_URI = os.getenv("USE_LOCAL_FILE_URI", "1").strip().lower() in {"1", "true", "yes", "on"}
 
 
+async def _video_meta(media: DownloadResult) -> tuple[int | None, int | None, int | None]:
+    width, height, duration = media.width, media.height, media.duration
+    if not (width and height) and media.path:
+        info = await probe_video(media.path)
+        if info:
+            width, height = info.width, info.height
+            duration = duration or info.duration
+        else:
+            logger.warning("⚠️ [SEND] Разрешение не определено, отправляем без width/height: %s", media.path)
+    return width, height, int(duration) if duration else None
+
+
+async def build_video_caption(bot: Bot) -> str:
+    return f"🎬 Скачивай видео с Tiktok | Instagram | YouTube \n\n@{await get_bot_username(bot)}"
+
+
+async def build_audio_caption(bot: Bot) -> str:
+    return f"🎵 Скачивай аудио с Tiktok | Instagram | YouTube \n\n@{await get_bot_username(bot)}"
+
+
 def _build_local_file_uri(file_path: str) -> str:
     abs_path = os.path.abspath(file_path)
     return f"file://{abs_path}"
 
+
+async def _send_remote_video(
+    bot: Bot,
+    chat_id: int,
+    media: DownloadResult,
+    caption: str,
+    width: int | None,
+    height: int | None,
+    duration: int | None,
+) -> types.Message:
+    """
+    Отправка медиа, которое не сохранялось на диск (media.remote_url).
+    URLInputFile читает ответ по ссылке и сразу отдаёт его телом multipart в Bot API;
+    если не вышло — передаём ссылку строкой, и Bot API скачивает файл сам.
+    """
+    try:
+        logger.info("📤 [SEND] Отправляем видео потоком по ссылке")
+        return await bot.send_video(
+            chat_id=chat_id,
+            video=URLInputFile(
+                media.remote_url,
+                headers=DOWNLOAD_HEADERS,
+                filename="video.mp4",
+                timeout=UPLOAD_REQUEST_TIMEOUT_SECONDS,
+            ),
+            caption=caption,
+            width=width,
+            height=height,
+            duration=duration,
+            supports_streaming=True,
+            request_timeout=UPLOAD_REQUEST_TIMEOUT_SECONDS,
+        )
+    except Exception as stream_err:
+        logger.warning("⚠️ [SEND] Потоковая отправка не сработала, передаём URL в Bot API: %s", stream_err)
+        return await bot.send_video(
+            chat_id=chat_id,
+            video=media.remote_url,
+            caption=caption,
+            width=width,
+            height=height,
+            duration=duration,
+            supports_streaming=True,
+            request_timeout=UPLOAD_REQUEST_TIMEOUT_SECONDS,
+        )
+
+
 async def send_video(
     bot: Bot,
     message: types.Message,
     chat_id: int,
     user_id: int,
-    file_path: str,
-    width: int,
-    height: int,
+    media: DownloadResult,
 ) -> tuple[bool, str | None]:
     """
     Отправка уже скачанного файла:
     - Отправляем напрямую в Telegram.
+    - Размеры/длительность берём из DownloadResult, файл пробуем только если загрузчик их не знает.
+    - Медиа без файла (media.remote_url) отправляется потоком, минуя диск.
     - После отправки файл удаляется отложенно.
     """
- 
+    file_path = media.path
+    width, height, duration = await _video_meta(media)
     try:
-        me = await bot.get_me()
-        caption = f"🎬 Скачивай видео с Tiktok | Instagram | YouTube \n\n@{me.username}"
-        if USE_LOCAL_FILE_URI:
+        caption = await build_video_caption(bot)
+        if file_path is None and media.remote_url:
+            sent_message = await _send_remote_video(bot, chat_id, media, caption, width, height, duration)
+        elif USE_LOCAL_FILE_URI:
             local_uri = _build_local_file_uri(file_path)
             logger.info("📤 [SEND] Пытаемся отправить видео через local file URI: %s", local_uri)
             try:
@@ -43,6 +115,7 @@ async def send_video(
                     caption=caption,
                     width=width,
                     height=height,
+                    duration=duration,
                     supports_streaming=True,
                     request_timeout=UPLOAD_REQUEST_TIMEOUT_SECONDS,
                 )
@@ -54,6 +127,7 @@ async def send_video(
                     caption=caption,
                     width=width,
                     height=height,
+                    duration=duration,
                     supports_streaming=True,
                     request_timeout=UPLOAD_REQUEST_TIMEOUT_SECONDS,
                 )
@@ -64,6 +138,7 @@ async def send_video(
                 caption=caption,
                 width=width,
                 height=height,
+                duration=duration,
                 supports_streaming=True,
                 request_timeout=UPLOAD_REQUEST_TIMEOUT_SECONDS,
             )
@@ -72,9 +147,10 @@ async def send_video(
             file_id = sent_message.video.file_id
         elif getattr(sent_message, "document", None):
             file_id = sent_message.document.file_id
-        # Удаляем файл спустя 10 секунд после отправки
-        logger.info(f"🗑️ [SEND] Файл {file_path} будет удалён через 10 секунд")
-        asyncio.create_task(remove_file_later(file_path, delay=10, message=message))
+        if file_path:
+            # Удаляем файл спустя 10 секунд после отправки
+            logger.info(f"🗑️ [SEND] Файл {file_path} будет удалён через 10 секунд")
+            asyncio.create_task(remove_file_later(file_path, delay=10, message=message))
         logger.info("✅ [SEND] Отправка завершена")
         return True, file_id
     except Exception as e:
@@ -82,21 +158,23 @@ async def send_video(
         # Удаляем файл при ошибке
         try:
             await bot.send_message(chat_id, "❗️ Ошибка при отправке видео. Попробуйте позже.")
-            await asyncio.to_thread(os.remove, file_path)
+            if file_path:
+                await asyncio.to_thread(os.remove, file_path)
         except Exception:
             pass
         return False, None
 
 
-async def send_audio(bot: Bot, message:types.Message, chat_id: int, file_path: str) -> tuple[bool, str | None]:
+async def send_audio(bot: Bot, message:types.Message, chat_id: int, media: DownloadResult) -> tuple[bool, str | None]:
     """
     Отправляет аудио в чат с подписью.
     Файл удаляется через 10 секунд после отправки.
     """
+    file_path = media.path
+    duration = int(media.duration) if media.duration else None
     try:
         logger.info("✉️ [SEND] Отправка audio в Telegram")
-        me = await bot.get_me()
-        caption = f"🎵 Скачивай аудио с Tiktok | Instagram | YouTube \n\n@{me.username}"
+        caption = await build_audio_caption(bot)
         if USE_LOCAL_FILE_URI:
             local_uri = _build_local_file_uri(file_path)
             logger.info("📤 [SEND] Пытаемся отправить аудио через local file URI: %s", local_uri)
@@ -105,6 +183,7 @@ async def send_audio(bot: Bot, message:types.Message, chat_id: int, file_path: s
                     chat_id=chat_id,
                     audio=local_uri,
                     caption=caption,
+                    duration=duration,
                     request_timeout=UPLOAD_REQUEST_TIMEOUT_SECONDS,
                 )
             except Exception as local_err:
@@ -113,6 +192,7 @@ async def send_audio(bot: Bot, message:types.Message, chat_id: int, file_path: s
                     chat_id=chat_id,
                     audio=FSInputFile(file_path),
                     caption=caption,
+                    duration=duration,
                     request_timeout=UPLOAD_REQUEST_TIMEOUT_SECONDS,
                 )
         else:
@@ -120,6 +200,7 @@ async def send_audio(bot: Bot, message:types.Message, chat_id: int, file_path: s
                 chat_id=chat_id,
                 audio=FSInputFile(file_path),
                 caption=caption,
+                duration=duration,
                 request_timeout=UPLOAD_REQUEST_TIMEOUT_SECONDS,
             )
         file_id = sent_message.audio.file_id if getattr(sent_message, "audio", None) else None
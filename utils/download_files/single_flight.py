@@ -0,0 +1,58 @@
+"""Single-flight: одна загрузка на одинаковый (url, media_type, quality).
+
+Если несколько пользователей одновременно прислали одну и ту же ссылку,
+скачивает и загружает в Telegram только первый (leader). Остальные (followers)
+ждут его результат и переотправляют полученный file_id без скачивания.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+Producer = Callable[[], Awaitable[tuple[bool, str | None]]]
+Reuser = Callable[[str], Awaitable[bool]]
+
+
+class SingleFlight:
+    """Реестр выполняющихся загрузок: ключ -> future с file_id лидера."""
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: Hashable, produce: Producer, reuse: Reuser) -> tuple[bool, str | None]:
+        """
+        Выполняет produce() как лидер либо дожидается текущего лидера.
+        produce возвращает (sent_ok, file_id) так же, как send_video/send_audio.
+        reuse(file_id) отправляет готовый file_id follower'у.
+        Если лидер не получил file_id (ошибка), один из ожидающих становится новым лидером.
+        """
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            logger.info("🔗 [FLIGHT] Ожидаем уже идущую загрузку: key=%s", key)
+            # shield: отмена follower'а не должна отменять общий future
+            file_id = await asyncio.shield(flight)
+            if file_id and await reuse(file_id):
+                self.coalesced += 1
+                return True, file_id
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        file_id: str | None = None
+        try:
+            sent_ok, file_id = await produce()
+            return sent_ok, file_id
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if not flight.done():
+                flight.set_result(file_id)
@@ -1,9 +1,180 @@
-from moviepy import VideoFileClip
+"""Быстрое определение ширины/высоты/длительности видео перед отправкой.
 
+Порядок: разбор боксов MP4 (moov/mvhd + trak/tkhd) без декодирования →
+один вызов ffprobe вне event loop → moviepy как последний запасной вариант.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import struct
+from dataclasses import dataclass
+
+from utils.executors import processing_executor
+
+logger = logging.getLogger(__name__)
+
+FFPROBE_TIMEOUT_SECONDS = 15
+# tkhd без заголовка бокса: 84 байта в версии 0, 96 в версии 1 (64-битные времена)
+_TKHD_MAX_BYTES = 96
+
+
+@dataclass(slots=True)
+class VideoInfo:
+    width: int
+    height: int
+    duration: float | None = None
+
+
+def _iter_boxes(f, start: int, end: int):
+    """Итерирует боксы ISO BMFF в диапазоне [start, end): (type, payload_start, box_end)."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_len = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack(">Q", large)[0]
+            header_len = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_len:
+            return
+        yield box_type, pos + header_len, min(pos + size, end)
+        pos += size
+
+
+def _parse_mvhd(payload: bytes) -> float | None:
+    if not payload:
+        return None
+    if payload[0] == 1 and len(payload) >= 32:
+        timescale, duration = struct.unpack(">IQ", payload[20:32])
+    elif len(payload) >= 20:
+        timescale, duration = struct.unpack(">II", payload[12:20])
+    else:
+        return None
+    return duration / timescale if timescale else None
+
+
+def _parse_tkhd(payload: bytes) -> tuple[int, int] | None:
+    if not payload:
+        return None
+    offset = 36 if payload[0] == 1 else 24
+    # reserved(8) + layer/alternate_group/volume/reserved(8) → матрица 3x3, затем width/height
+    matrix_at = offset + 16
+    size_at = matrix_at + 36
+    if len(payload) < size_at + 8:
+        return None
+    a, b, _u, c, d = struct.unpack(">5i", payload[matrix_at:matrix_at + 20])
+    width, height = struct.unpack(">II", payload[size_at:size_at + 8])
+    width >>= 16
+    height >>= 16
+    if not width or not height:
+        return None
+    # Повёрнутое на 90/270° видео: Telegram ожидает ширину/высоту уже после поворота
+    if a == 0 and d == 0 and b != 0 and c != 0:
+        width, height = height, width
+    return width, height
+
+
+def probe_mp4(path: str) -> VideoInfo | None:
+    """Читает размеры видео-дорожки и длительность из заголовков MP4. None — не MP4 или нет moov."""
+    try:
+        with open(path, "rb") as f:
+            file_end = os.fstat(f.fileno()).st_size
+            for box_type, payload_start, box_end in _iter_boxes(f, 0, file_end):
+                if box_type != b"moov":
+                    continue
+                duration = None
+                dimensions = None
+                for child_type, child_start, child_end in _iter_boxes(f, payload_start, box_end):
+                    if child_type == b"mvhd":
+                        f.seek(child_start)
+                        duration = _parse_mvhd(f.read(min(32, child_end - child_start)))
+                    elif child_type == b"trak" and dimensions is None:
+                        for sub_type, sub_start, sub_end in _iter_boxes(f, child_start, child_end):
+                            if sub_type == b"tkhd":
+                                f.seek(sub_start)
+                                dimensions = _parse_tkhd(f.read(min(_TKHD_MAX_BYTES, sub_end - sub_start)))
+                                break
+                if dimensions:
+                    return VideoInfo(width=dimensions[0], height=dimensions[1], duration=duration)
+                return None
+    except (OSError, struct.error):
+        logger.debug("⚠️ [PROBE] Не удалось разобрать MP4: %s", path, exc_info=True)
+    return None
+
+
+async def probe_ffprobe(path: str) -> VideoInfo | None:
+    """Один вызов ffprobe (асинхронный subprocess, не блокирует event loop)."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height:stream_side_data=rotation:format=duration",
+        "-of", "json",
+        path,
+    ]
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, _stderr = await asyncio.wait_for(proc.communicate(), FFPROBE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return None
+        if proc.returncode != 0:
+            return None
+        data = json.loads(stdout or b"{}")
+    except (OSError, ValueError):
+        return None
+
+    streams = data.get("streams") or []
+    if not streams:
+        return None
+    stream = streams[0]
+    width, height = int(stream.get("width") or 0), int(stream.get("height") or 0)
+    if not width or not height:
+        return None
+    for side_data in stream.get("side_data_list") or []:
+        if abs(int(side_data.get("rotation") or 0)) in {90, 270}:
+            width, height = height, width
+    try:
+        duration = float((data.get("format") or {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    return VideoInfo(width=width, height=height, duration=duration)
+
+
+def probe_moviepy(path: str) -> VideoInfo | None:
+    """Запасной вариант через moviepy: медленно (поднимает ffmpeg-reader), только если остальное не сработало."""
+    try:
+        from moviepy import VideoFileClip
+
+        with VideoFileClip(path) as clip:
+            return VideoInfo(width=int(clip.w), height=int(clip.h), duration=clip.duration)
+    except Exception:
+        logger.warning("⚠️ [PROBE] moviepy не смог прочитать файл: %s", path, exc_info=True)
+        return None
+
+
+async def probe_video(path: str) -> VideoInfo | None:
+    """Определяет размеры и длительность видео, не блокируя event loop."""
+    info = await processing_executor.run(probe_mp4, path)
+    if info:
+        return info
+    info = await probe_ffprobe(path)
+    if info:
+        return info
+    return await processing_executor.run(probe_moviepy, path)
 
-def get_video_resolution(path: str) -> tuple[int, int]:
-    """
-    Получает разрешение видеофайла.
-    """
-    with VideoFileClip(path) as clip:
-        return clip.w, clip.h
@@ -1,12 +1,22 @@
+import asyncio
+import logging
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
-from config import YOUTUBE_MAX_DURATION_SECONDS
+from config import YOUTUBE_MAX_DURATION_SECONDS, YOUTUBE_METADATA_TTL_SECONDS
 from db.base import get_session
 from db.tokens import get_token_snapshot
-from services.youtube import YTDLPDownloader
+from db.youtube_metadata import get_youtube_metadata, upsert_youtube_metadata
+from services.youtube import YTDLPDownloader, get_youtube_video_id
 from utils.token_policy import YOUTUBE_QUALITY_ORDER, format_duration, get_youtube_price
 
 
+logger = logging.getLogger(__name__)
+
+# video id, которые сейчас обновляются в фоне (stale-while-revalidate), и ссылки на задачи
+_refreshing: set[str] = set()
+_refresh_tasks: set[asyncio.Task] = set()
+
 QUALITY_LABELS = {
     "low": "Низкое",
     "medium": "Среднее",
@@ -99,12 +109,53 @@ def _pick_itag_for_quality(formats: list[dict], quality: str) -> tuple[int, int]
     return None
 
 
+async def _fetch_and_store_options(url: str, video_id: str) -> dict:
+    info = await YTDLPDownloader().get_available_video_options(url)
+    async with get_session() as session:
+        await upsert_youtube_metadata(session, video_id, info)
+        await session.commit()
+    return info
+
+
+async def _refresh_options(url: str, video_id: str) -> None:
+    try:
+        await _fetch_and_store_options(url, video_id)
+        logger.info("🔄 [YT-META] Метаданные обновлены в фоне: video_id=%s", video_id)
+    except Exception as e:
+        logger.warning("⚠️ [YT-META] Фоновое обновление не удалось: video_id=%s err=%s", video_id, e)
+    finally:
+        _refreshing.discard(video_id)
+
+
+async def load_video_options(url: str) -> dict:
+    """
+    Метаданные и форматы видео с кэшем (память → Postgres → YouTube).
+    Свежая запись отдаётся сразу; устаревшая (старше YOUTUBE_METADATA_TTL_SECONDS,
+    но моложе stale-TTL) тоже отдаётся сразу, а обновление запускается в фоне.
+    """
+    video_id = get_youtube_video_id(url)
+    if video_id is None:
+        return await YTDLPDownloader().get_available_video_options(url)
+
+    async with get_session() as session:
+        cached = await get_youtube_metadata(session, video_id)
+        await session.commit()
+    if cached is not None:
+        info, age = cached
+        if age >= YOUTUBE_METADATA_TTL_SECONDS and video_id not in _refreshing:
+            _refreshing.add(video_id)
+            task = asyncio.create_task(_refresh_options(url, video_id))
+            _refresh_tasks.add(task)
+            task.add_done_callback(_refresh_tasks.discard)
+        return info
+    return await _fetch_and_store_options(url, video_id)
+
+
 async def prepare_youtube_menu(url: str, user_id: int):
     """
     Return (keyboard, caption, preview, state_payload) for YouTube options.
     """
-    downloader = YTDLPDownloader()
-    info = await downloader.get_available_video_options(url)
+    info = await load_video_options(url)
     preview = info["thumbnail_url"]
     duration_seconds = int(info.get("duration_seconds") or 0)
     formats = info.get("formats", [])
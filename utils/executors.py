@@ -0,0 +1,116 @@
+"""Отдельные пулы потоков под классы блокирующей работы загрузчиков.
+
+metadata   — быстрые запросы метаданных (YouTube(url), списки потоков, filesize);
+transfer   — долгие загрузки (stream.download, yt-dlp);
+processing — разбор/проверка файлов (probe, moviepy);
+disk_io    — короткие записи на диск (куски ranged-загрузок, подготовка файлов):
+             их нельзя ставить в очередь за многоминутными задачами transfer.
+
+Раньше всё шло в executor по умолчанию, и пачка долгих загрузок занимала все
+потоки, из-за чего меню YouTube ждало своей очереди. У каждого пула свой
+размер и метрики: глубина очереди и время ожидания до старта задачи.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from config import (
+    EXECUTOR_DISK_IO_WORKERS,
+    EXECUTOR_METADATA_WORKERS,
+    EXECUTOR_PROCESSING_WORKERS,
+    EXECUTOR_TRANSFER_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_WAIT_SAMPLES = 512
+
+
+class InstrumentedExecutor:
+    """ThreadPoolExecutor с учётом очереди и времени ожидания задач."""
+
+    def __init__(self, name: str, max_workers: int) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._max_wait = 0.0
+        self._waits: deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Выполняет fn(*args) в пуле, не блокируя event loop."""
+        submitted = time.monotonic()
+
+        def call() -> T:
+            wait = time.monotonic() - submitted
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._waits.append(wait)
+                self._max_wait = max(self._max_wait, wait)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        def on_done(future) -> None:
+            # Отменённая до старта задача так и не попала в call()
+            if future.cancelled():
+                with self._lock:
+                    self._queued -= 1
+
+        with self._lock:
+            self._queued += 1
+        future = self._pool.submit(call)
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "name": self.name,
+                "workers": self.max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                "wait_max": self._max_wait,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+metadata_executor = InstrumentedExecutor("metadata", EXECUTOR_METADATA_WORKERS)
+transfer_executor = InstrumentedExecutor("transfer", EXECUTOR_TRANSFER_WORKERS)
+processing_executor = InstrumentedExecutor("processing", EXECUTOR_PROCESSING_WORKERS)
+disk_io_executor = InstrumentedExecutor("disk_io", EXECUTOR_DISK_IO_WORKERS)
+
+_EXECUTORS = (metadata_executor, transfer_executor, processing_executor, disk_io_executor)
+
+
+def get_executor_stats() -> list[dict[str, Any]]:
+    return [executor.stats() for executor in _EXECUTORS]
+
+
+def shutdown_executors() -> None:
+    """Останавливает пулы при выключении бота; задачи из очереди отменяются."""
+    for executor in _EXECUTORS:
+        executor.shutdown()
+    logger.info("🧵 [EXECUTOR] Пулы потоков остановлены")
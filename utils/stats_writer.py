@@ -0,0 +1,128 @@
+"""Фоновая запись статистики скачиваний (write-behind).
+
+Счётчики daily/total/platform_downloads и user_activity не нужны пользователю
+в момент отправки файла. Хендлер кладёт событие в asyncio.Queue, воркер
+копит инкременты по (user_id, day, platform) в течение короткого окна и
+сбрасывает их в БД многострочными upsert'ами (db.downloads.flush_download_counters).
+При остановке бота очередь дочитывается до конца, чтобы счётчики не терялись.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+
+from config import STATS_FLUSH_INTERVAL_SECONDS, STATS_FLUSH_MAX_BATCH
+from db.base import get_session
+from db.downloads import flush_download_counters
+from db.tokens import today_utc
+
+logger = logging.getLogger(__name__)
+
+CounterKey = tuple[int, datetime.date, str]
+_STOP = object()
+
+
+class DownloadStatsWriter:
+    """Очередь + воркер, агрегирующий инкременты и пишущий их пачками."""
+
+    def __init__(self, flush_interval: float, max_batch: int) -> None:
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+        self._pending: dict[CounterKey, int] = {}
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        # Во время остановки новые события пишутся синхронно: финальный flush их уже не увидит
+        return self._task is not None and not self._task.done() and not self._stopping
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="download-stats-writer")
+        logger.info("📊 [STATS] Фоновая запись статистики запущена (окно %.1fс)", self.flush_interval)
+
+    def enqueue(self, user_id: int, platform: str) -> bool:
+        """Ставит +1 скачивание в очередь. False — воркер не запущен, писать нужно синхронно."""
+        if not self.running:
+            return False
+        self._queue.put_nowait((user_id, today_utc(), platform))
+        return True
+
+    async def stop(self) -> None:
+        """Дочитывает очередь, сбрасывает остаток в БД и останавливает воркер."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._queue.put_nowait(_STOP)
+        await self._task
+        self._task = None
+        logger.info("📊 [STATS] Фоновая запись статистики остановлена")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            if self._pending:
+                # Прошлый flush не удался: повторяем по таймеру, не дожидаясь новых скачиваний
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    await self._flush()
+                    continue
+            else:
+                item = await self._queue.get()
+            if item is _STOP:
+                stopping = True
+            else:
+                self._add(item)
+                deadline = loop.time() + self.flush_interval
+                while len(self._pending) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    self._add(item)
+
+            if stopping:
+                # Забираем всё, что успели положить до сигнала остановки
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not _STOP:
+                        self._add(item)
+            await self._flush(final=stopping)
+
+    def _add(self, item: CounterKey) -> None:
+        self._pending[item] = self._pending.get(item, 0) + 1
+
+    async def _flush(self, *, final: bool = False) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            async with get_session() as session:
+                await flush_download_counters(session, batch)
+                await session.commit()
+            logger.debug("📊 [STATS] Записано %s ключей (%s скачиваний)", len(batch), sum(batch.values()))
+        except Exception:
+            logger.exception("❌ [STATS] Не удалось записать статистику, повторим в следующем окне")
+            # Возвращаем инкременты обратно, чтобы не потерять их
+            for key, count in batch.items():
+                self._pending[key] = self._pending.get(key, 0) + count
+            if final:
+                logger.error("❌ [STATS] Остановка: потеряно %s скачиваний", sum(self._pending.values()))
+                self._pending = {}
+
+
+download_stats_writer = DownloadStatsWriter(STATS_FLUSH_INTERVAL_SECONDS, STATS_FLUSH_MAX_BATCH)
@@ -50,6 +50,16 @@ def get_youtube_price(quality: str, duration_seconds: int) -> tuple[str, int] |
     return pricing["currency"], int(tiers[tier_index])
 
 
+def get_download_priority(currency: str | None) -> str:
+    """
+    Priority class for the download queue by the currency the user paid with.
+    'token_x' > 'token' > 'free' (TikTok/Instagram and other unpaid downloads).
+    """
+    if currency in {"token_x", "token"}:
+        return currency
+    return "free"
+
+
 def format_duration(seconds: int) -> str:
     """Human readable duration format H:MM:SS or M:SS."""
     total = max(0, int(seconds))